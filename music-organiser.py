@@ -6,220 +6,3919 @@ A Python script that automatically organizes music files into artist/album folde
 
 import os
 import sys
+import errno
+import hashlib
+import json
+import itertools
+import math
+import mmap
+import select
+import struct
+import ctypes
+import ctypes.util
 import argparse
+import asyncio
 from mutagen import File
 import shutil
 from pathlib import Path
 import re
-from typing import Tuple, Set
+import sqlite3
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, Set, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+class MetadataCache:
+    """
+    On-disk cache of extracted (artist, album) pairs.
+
+    Entries are keyed by the file's stat identity (device, inode, size,
+    mtime_ns), so any rewrite of a file invalidates its entry automatically.
+    The cache is bounded to max_entries; the least recently used rows are
+    evicted when it is closed.
+    """
+
+    def __init__(self, db_path: str, max_entries: int = 200000):
+        self.db_path = Path(db_path).expanduser()
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._pending = 0
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS metadata ("
+            " dev INTEGER NOT NULL,"
+            " ino INTEGER NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " artist TEXT NOT NULL,"
+            " album TEXT NOT NULL,"
+            " last_used INTEGER NOT NULL,"
+            " PRIMARY KEY (dev, ino))"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS metadata_last_used ON metadata (last_used)"
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def stat_key(st: os.stat_result) -> Tuple[int, int, int, int]:
+        """Build the cache key for a stat result."""
+        return st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns
+
+    def get(self, key: Tuple[int, int, int, int]) -> Optional[Tuple[str, str]]:
+        """
+        Looks up cached metadata for a stat key.
+
+        Returns:
+            Tuple of (artist, album), or None if missing or stale
+        """
+        dev, ino, size, mtime_ns = key
+        row = self.conn.execute(
+            "SELECT size, mtime_ns, artist, album FROM metadata WHERE dev = ? AND ino = ?",
+            (dev, ino)
+        ).fetchone()
+
+        if row is None or row[0] != size or row[1] != mtime_ns:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.conn.execute(
+            "UPDATE metadata SET last_used = ? WHERE dev = ? AND ino = ?",
+            (time.time_ns(), dev, ino)
+        )
+        self._note_write()
+        return row[2], row[3]
+
+    def put(self, key: Tuple[int, int, int, int], artist: str, album: str) -> None:
+        """Stores metadata for a stat key, replacing any stale entry."""
+        dev, ino, size, mtime_ns = key
+        self.conn.execute(
+            "INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (dev, ino, size, mtime_ns, artist, album, time.time_ns())
+        )
+        self._note_write()
+
+    def _note_write(self) -> None:
+        # Group writes into large transactions instead of one fsync per file
+        self._pending += 1
+        if self._pending >= 1000:
+            self.conn.commit()
+            self._pending = 0
+
+    def evict(self) -> int:
+        """
+        Drops the least recently used entries beyond max_entries.
+
+        Returns:
+            Number of evicted entries
+        """
+        count = self.conn.execute("SELECT COUNT(*) FROM metadata").fetchone()[0]
+        excess = count - self.max_entries
+        if excess <= 0:
+            return 0
+
+        self.conn.execute(
+            "DELETE FROM metadata WHERE rowid IN ("
+            " SELECT rowid FROM metadata ORDER BY last_used LIMIT ?)",
+            (excess,)
+        )
+        return excess
+
+    def flush(self) -> None:
+        """Evicts old entries and commits pending writes."""
+        self.evict()
+        self.conn.commit()
+        self._pending = 0
+
+    def close(self) -> None:
+        """Evicts old entries, commits and closes the database."""
+        self.flush()
+        self.conn.close()
+
+
+class InotifyWatcher:
+    """
+    Minimal recursive Linux inotify wrapper built on ctypes.
+
+    Reports files that were closed after writing or moved into the tree, and
+    adds watches for new subdirectories as they appear.
+    """
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    IN_CLOEXEC = 0o2000000
+
+    WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self):
+        if not sys.platform.startswith('linux'):
+            raise OSError("inotify is only available on Linux")
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self._libc.inotify_init1(self.IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_init1 failed: {os.strerror(err)}")
+        self._watches: Dict[int, Path] = {}
+
+    def add_tree(self, root: Path) -> List[Path]:
+        """
+        Watches root and every directory below it.
+
+        Returns:
+            Files already present in the newly watched directories
+        """
+        existing = []
+        for dir_root, _, files in os.walk(root):
+            dir_path = Path(dir_root)
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(dir_path), self.WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                print(f"⚠ Couldn't watch {dir_path}: {os.strerror(err)}")
+                continue
+            self._watches[wd] = dir_path
+            existing.extend(dir_path / filename for filename in files)
+        return existing
+
+    def read_events(self, timeout: float) -> Tuple[List[Path], bool]:
+        """
+        Waits up to timeout seconds for events.
+
+        Returns:
+            Tuple of (files written or moved in, whether the kernel queue overflowed)
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return [], False
+
+        data = os.read(self.fd, 64 * 1024)
+        files = []
+        overflow = False
+        offset = 0
+
+        while offset + self.EVENT_HEADER.size <= len(data):
+            wd, mask, _, name_len = self.EVENT_HEADER.unpack_from(data, offset)
+            offset += self.EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + name_len].rstrip(b'\0'))
+            offset += name_len
+
+            if mask & self.IN_Q_OVERFLOW:
+                overflow = True
+                continue
+            if mask & self.IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+
+            parent = self._watches.get(wd)
+            if parent is None or not name:
+                continue
+
+            path = parent / name
+            if mask & self.IN_ISDIR:
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    files.extend(self.add_tree(path))
+            elif mask & (self.IN_CLOSE_WRITE | self.IN_MOVED_TO):
+                files.append(path)
+
+        return files, overflow
+
+    def close(self) -> None:
+        """Releases the inotify descriptor."""
+        os.close(self.fd)
+
+
+class LibraryCatalog:
+    """
+    SQLite catalog of the files organized into the destination library.
+
+    One row per file, keyed by its path relative to the destination, holding
+    size, mtime, a partial content hash, the artist/album folders, format,
+    duration and bitrate. The hash is the duplicate detector's partial hash
+    of the compared range ('content' or 'audio', fixed when the catalog is
+    created). The database runs in WAL mode and rows are written in bulk
+    transactions.
+
+    A catalog created for an empty library, or rebuilt from one, is marked
+    complete; duplicate checks then query it by (artist, album, hash)
+    instead of reading the album directories.
+
+    The connection may be handed to one writer thread at a time. A read-only
+    catalog (for dry runs) must already exist and is never written; changes
+    to its completeness are kept in memory.
+    """
+
+    BATCH_SIZE = 1000
+
+    def __init__(self, db_path: str, hash_kind: str = 'content', read_only: bool = False):
+        self.db_path = Path(db_path).expanduser()
+        self.read_only = read_only
+        self._rows: List[tuple] = []
+
+        if read_only:
+            # Without a pending WAL, open it immutable so no -wal/-shm files appear
+            wal = self.db_path.with_name(self.db_path.name + '-wal')
+            mode = 'ro' if wal.exists() else 'ro&immutable=1'
+            self.conn = sqlite3.connect(f"{self.db_path.resolve().as_uri()}?mode={mode}", uri=True,
+                                        check_same_thread=False)
+            meta = dict(self.conn.execute("SELECT key, value FROM meta"))
+            self.created = False
+            self.hash_kind = meta.get('hash_kind', hash_kind)
+            self.complete = meta.get('complete') == '1'
+            return
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " hash BLOB NOT NULL,"
+            " artist TEXT NOT NULL,"
+            " album TEXT NOT NULL,"
+            " format TEXT NOT NULL,"
+            " duration REAL,"
+            " bitrate INTEGER)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS files_hash ON files (hash)")
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS files_artist_album ON files (artist, album)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+
+        meta = dict(self.conn.execute("SELECT key, value FROM meta"))
+        self.created = 'hash_kind' not in meta
+        if self.created:
+            self.conn.execute("INSERT INTO meta VALUES ('hash_kind', ?)", (hash_kind,))
+        self.hash_kind = meta.get('hash_kind', hash_kind)
+        self.complete = meta.get('complete') == '1'
+        self.conn.commit()
+
+    def add(self, relative_path: str, size: int, mtime_ns: int, digest: bytes,
+            artist: str, album: str, file_format: str,
+            duration: Optional[float], bitrate: Optional[int]) -> None:
+        """Queues a row for a file in the library, replacing any older one."""
+        self._rows.append((relative_path, size, mtime_ns, digest, artist, album,
+                           file_format, duration, bitrate))
+        if len(self._rows) >= self.BATCH_SIZE:
+            self.flush()
+
+    def add_many(self, rows: List[tuple]) -> None:
+        """Writes rows in the column order of add() as one transaction."""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def find(self, artist: str, album: str, digest: bytes) -> List[str]:
+        """
+        Looks up files of an album by partial hash.
+
+        Returns:
+            Relative paths of the matching files
+        """
+        self.flush()
+        return [row[0] for row in self.conn.execute(
+            "SELECT path FROM files WHERE artist = ? AND album = ? AND hash = ?",
+            (artist, album, digest))]
+
+    def album_names(self, artist: str, album: str) -> Set[str]:
+        """File names catalogued for an album."""
+        self.flush()
+        return {os.path.basename(row[0]) for row in self.conn.execute(
+            "SELECT path FROM files WHERE artist = ? AND album = ?", (artist, album))}
+
+    def clear(self, hash_kind: str) -> None:
+        """Drops every row before a rebuild, which may switch the hash kind."""
+        self._rows = []
+        with self.conn:
+            self.conn.execute("DELETE FROM files")
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('hash_kind', ?)", (hash_kind,))
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('complete', '0')")
+        self.hash_kind = hash_kind
+        self.complete = False
+
+    def set_complete(self, complete: bool) -> None:
+        """Records whether every file in the library is catalogued."""
+        self.complete = complete
+        if self.read_only:
+            return
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('complete', ?)",
+                              ('1' if complete else '0',))
+        self.complete = complete
+
+    def summary(self) -> Tuple[int, int, int, int]:
+        """
+        Counts the catalogued library; the last counts are kept after close().
+
+        Returns:
+            Tuple of (files, artists, albums, total bytes)
+        """
+        if self.conn is None:
+            return self._totals
+        self.flush()
+        return self.conn.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT artist),"
+            " (SELECT COUNT(*) FROM (SELECT DISTINCT artist, album FROM files)),"
+            " COALESCE(SUM(size), 0) FROM files").fetchone()
+
+    def flush(self) -> None:
+        """Writes queued rows in a single transaction."""
+        if self._rows:
+            rows, self._rows = self._rows, []
+            self.add_many(rows)
+
+    def close(self) -> None:
+        """Writes queued rows and closes the database."""
+        self._totals = self.summary()
+        self.conn.close()
+        self.conn = None
+
+
+class ScanState:
+    """
+    Source-tree index persisted between incremental runs.
+
+    For every directory it records the mtime seen before it was listed, its
+    subdirectories and a (size, mtime_ns) tuple per file. A directory whose
+    mtime is unchanged has the same entries as last time, so it isn't listed
+    again; files whose stat tuple is unchanged are not processed again.
+    """
+
+    VERSION = 1
+
+    def __init__(self, state_path: Path):
+        self.state_path = Path(state_path).expanduser()
+        self.previous: Dict[str, dict] = {}
+        self.current: Dict[str, dict] = {}
+        self.dirs_skipped = 0
+        self.files_skipped = 0
+
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == self.VERSION:
+                self.previous = data.get('dirs', {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"⚠ Ignoring unreadable state file {self.state_path}: {e}")
+
+    def save(self) -> None:
+        """Atomically writes the index gathered during this run."""
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_name(self.state_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': self.VERSION, 'dirs': self.current}, f,
+                      separators=(',', ':'))
+        os.replace(tmp_path, self.state_path)
+
+    def forget(self, rel_dir: str, names: List[str]) -> None:
+        """
+        Makes files that weren't organized count as new on the next run.
+
+        The directory's recorded mtime is invalidated too, or it wouldn't
+        be listed again while nothing in it changes.
+        """
+        record = self.current.get(rel_dir)
+        if record is None:
+            return
+        record['mtime_ns'] = -1
+        for name in names:
+            record['files'].pop(name, None)
+
+
+class MoveJournal:
+    """
+    Append-only write-ahead journal of file operations, stored as JSON Lines.
+
+    Each operation gets an 'intent' record before anything is touched, a
+    'copied' record once a cross-device copy is durable, and a 'removed'
+    record once the source is gone ('rolled_back' closes an operation that
+    was undone on resume). Records are buffered and fsynced in groups by the
+    caller, so a crash can lose progress markers but never an intent for an
+    operation that already started.
+    """
+
+    CLOSING_OPS = {'removed', 'rolled_back'}
+
+    def __init__(self, journal_path: Path):
+        self.journal_path = Path(journal_path).expanduser()
+        self.entries: Dict[int, dict] = {}
+        self.next_id = 1
+
+        try:
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break  # Torn final line from a crash
+                    if record['op'] == 'intent':
+                        self.entries[record['id']] = record
+                    elif record['op'] in self.CLOSING_OPS:
+                        self.entries.pop(record['id'], None)
+                    elif record['id'] in self.entries:
+                        self.entries[record['id']]['state'] = record['op']
+                    self.next_id = max(self.next_id, record['id'] + 1)
+        except FileNotFoundError:
+            pass
+
+        self._file = None
+
+    def incomplete(self) -> List[dict]:
+        """Intent records of operations that never finished, oldest first."""
+        return [entry for _, entry in sorted(self.entries.items())]
+
+    def intent(self, move: 'PlannedMove', existed: bool = False) -> int:
+        """
+        Records that a step is about to be applied.
+
+        Args:
+            move: The step
+            existed: Its destination already exists, so resume must never
+                     delete it
+
+        Returns:
+            The operation id used for later records
+        """
+        op_id = self.next_id
+        self.next_id += 1
+        record = {'id': op_id, 'op': 'intent', **move._asdict(),
+                  'source': os.path.abspath(move.source),
+                  'destination': os.path.abspath(move.destination), 'existed': existed}
+        self.entries[op_id] = record
+        self._write(record)
+        return op_id
+
+    def record(self, op_id: int, op: str) -> None:
+        """Records progress ('copied', 'removed' or 'rolled_back') of an operation."""
+        self._write({'id': op_id, 'op': op})
+        if op in self.CLOSING_OPS:
+            del self.entries[op_id]
+        else:
+            self.entries[op_id]['state'] = op
+
+    def sync(self) -> None:
+        """Makes every record written so far durable."""
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        """Closes the journal, removing it when nothing is left incomplete."""
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+        if not self.entries and self.journal_path.exists():
+            self.journal_path.unlink()
+
+    def _write(self, record: dict) -> None:
+        if self._file is None:
+            self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.journal_path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+class CopyScheduler:
+    """
+    Runs cross-device copies on a thread pool per (source, destination) device pair.
+
+    Each pair has its own concurrency limit (copies running at once) and
+    queue depth (copies waiting behind them), so a fast SSD isn't held back
+    by a slow disk or NAS, and a spinning disk isn't thrashed by parallel
+    copies. submit() blocks while a pair's queue is full. Completion
+    callbacks run on the submitting thread, in submission order per pair,
+    from submit(), poll() or drain(), so they need no locking.
+    """
+
+    def __init__(self, limit: int = 2, queue_depth: int = 4,
+                 pairs: Optional[Dict[Tuple[int, int], Tuple[int, int]]] = None):
+        """
+        Args:
+            limit: Default number of concurrent copies per device pair
+            queue_depth: Default number of copies queued per device pair
+            pairs: (limit, queue_depth) overrides by (source st_dev, destination st_dev)
+        """
+        self.limit = max(1, limit)
+        self.queue_depth = max(0, queue_depth)
+        self.pairs = dict(pairs or {})
+        self._devices: Dict[Tuple[Path, Path], Tuple[int, int]] = {}
+        self._lanes: Dict[Tuple[int, int], dict] = {}
+        self._lock = threading.Lock()
+
+    def device_pair(self, source_dir: Path, destination_dir: Path) -> Tuple[int, int]:
+        """(source st_dev, destination st_dev), looked up once per directory pair."""
+        dir_pair = (source_dir, destination_dir)
+        devices = self._devices.get(dir_pair)
+        if devices is None:
+            devices = (os.stat(source_dir).st_dev, os.stat(destination_dir).st_dev)
+            self._devices[dir_pair] = devices
+        return devices
+
+    def submit(self, source: Path, destination: Path, copy, on_done) -> None:
+        """
+        Queues copy(source, destination) on its device pair's pool.
+
+        Args:
+            copy: Copy function, e.g. copy_file
+            on_done: Called with the copy's result and None, or None and the
+                     exception the copy raised
+        """
+        lane = self._lane(self.device_pair(source.parent, destination.parent))
+        self.poll()
+        while len(lane['pending']) >= lane['limit'] + lane['queue_depth']:
+            self._finish(lane)
+        future = lane['executor'].submit(self._run, lane, copy, source, destination)
+        lane['pending'].append((future, on_done))
+
+    def poll(self) -> None:
+        """Runs the callbacks of copies that have finished, without waiting."""
+        for lane in self._lanes.values():
+            while lane['pending'] and lane['pending'][0][0].done():
+                self._finish(lane)
+
+    def drain(self) -> None:
+        """Waits for every queued copy and runs its callback."""
+        for lane in self._lanes.values():
+            while lane['pending']:
+                self._finish(lane)
+
+    def shutdown(self) -> None:
+        """Drains the queues and stops the copy threads."""
+        self.drain()
+        for lane in self._lanes.values():
+            lane['executor'].shutdown(wait=True)
+
+    def report(self) -> List[str]:
+        """One line per device pair: copies, bytes and throughput while busy."""
+        lines = []
+        for (src_dev, dst_dev), lane in self._lanes.items():
+            mib = lane['bytes'] / 1024 ** 2
+            rate = mib / lane['busy'] if lane['busy'] > 0 else 0.0
+            lines.append(f"{self._device_name(src_dev)} → "
+                         f"{self._device_name(dst_dev)}: {lane['files']} copies, "
+                         f"{mib:.1f} MiB in {lane['busy']:.1f}s ({rate:.1f} MiB/s, "
+                         f"{lane['limit']} at a time, {lane['errors']} failed)")
+        return lines
+
+    @staticmethod
+    def _device_name(device: int) -> str:
+        """major:minor where the platform has them (not on Windows), else the raw st_dev."""
+        if hasattr(os, 'major'):
+            return f"{os.major(device)}:{os.minor(device)}"
+        return str(device)
+
+    def _lane(self, pair: Tuple[int, int]) -> dict:
+        lane = self._lanes.get(pair)
+        if lane is None:
+            limit, queue_depth = self.pairs.get(pair, (self.limit, self.queue_depth))
+            lane = {'limit': limit, 'queue_depth': queue_depth, 'pending': deque(),
+                    'executor': ThreadPoolExecutor(limit, thread_name_prefix=f'copy-{pair[0]}-{pair[1]}'),
+                    'files': 0, 'bytes': 0, 'errors': 0, 'busy': 0.0, 'active': 0, 'since': 0.0}
+            self._lanes[pair] = lane
+        return lane
+
+    def _run(self, lane: dict, copy, source: Path, destination: Path) -> tuple:
+        """Copy thread job; tracks the time the pair spends with copies running."""
+        with self._lock:
+            lane['active'] += 1
+            if lane['active'] == 1:
+                lane['since'] = time.monotonic()
+        try:
+            result = copy(source, destination)
+            return os.stat(destination).st_size, result
+        finally:
+            with self._lock:
+                lane['active'] -= 1
+                if lane['active'] == 0:
+                    lane['busy'] += time.monotonic() - lane['since']
+
+    def _finish(self, lane: dict) -> None:
+        """Waits for a pair's oldest copy and runs its callback."""
+        future, on_done = lane['pending'].popleft()
+        try:
+            size, result = future.result()
+        except Exception as e:
+            lane['errors'] += 1
+            on_done(None, e)
+            return
+        lane['bytes'] += size
+        lane['files'] += 1
+        on_done(result, None)
+
+
+class DestinationIndex:
+    """
+    In-memory listing of destination directories.
+
+    Each directory is read with a single scandir the first time it is needed
+    and kept up to date as files are moved in, so collision and duplicate
+    checks are answered without going back to the filesystem. A directory
+    missing from its (already indexed) parent is known to be empty without
+    being scanned at all.
+    """
+
+    def __init__(self):
+        # Directory -> {name: is a directory}
+        self._listings: Dict[Path, Dict[str, bool]] = {}
+        self.scans = 0
+
+    def listing(self, directory: Path) -> Dict[str, bool]:
+        """
+        Entries of a directory, empty if it doesn't exist.
+
+        Returns:
+            The live dict of name -> is a directory
+        """
+        listing = self._listings.get(directory)
+        if listing is not None:
+            return listing
+
+        listing = {}
+        parent = self._listings.get(directory.parent)
+        if parent is None or parent.get(directory.name):
+            self.scans += 1
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        listing[entry.name] = entry.is_dir()
+            except (FileNotFoundError, NotADirectoryError):
+                pass
+
+        self._listings[directory] = listing
+        return listing
+
+    def exists(self, path: Path) -> bool:
+        """Whether anything exists at path."""
+        return path.name in self.listing(path.parent)
+
+    def is_dir(self, path: Path) -> bool:
+        """Whether path is an existing directory."""
+        return self.listing(path.parent).get(path.name, False)
+
+    def add(self, path: Path) -> None:
+        """Records a file that was just moved into place."""
+        self.listing(path.parent)[path.name] = False
+
+    def discard(self, path: Path) -> None:
+        """Records a file that was just removed."""
+        listing = self._listings.get(path.parent)
+        if listing is not None:
+            listing.pop(path.name, None)
+
+    def add_directory(self, path: Path, names: Optional[List[str]] = None) -> None:
+        """
+        Records a directory that was just created (with its parents).
+
+        Args:
+            path: The new directory
+            names: Files it already holds, e.g. after renaming a folder into place
+        """
+        child = path
+        while child.parent != child:
+            parent = self._listings.get(child.parent)
+            if parent is not None:
+                parent[child.name] = True
+            child = child.parent
+        self._listings[path] = dict.fromkeys(names or (), False)
+
+    def clear(self) -> None:
+        """Forgets every listing, e.g. when other programs may have changed the library."""
+        self._listings.clear()
+
+
+class DestinationBloom:
+    """
+    Bloom filter over the destination library, persisted between runs.
+
+    It holds two kinds of keys: each file's path relative to the destination,
+    and its album directory combined with the duplicate detector's size key.
+    A negative answer is definite, so a file whose name and size are both new
+    to its album is planned without listing or stat'ing the album directory;
+    only probable hits go to disk.
+
+    refresh() walks the library and adds the files in directories or with
+    mtimes newer than the last build. Bloom filters can't forget, so files
+    removed from the library linger as false positives until a full rebuild.
+    Files added since the last build would be false negatives, so answers
+    are only trusted for album directories that covers() vouches for.
+    """
+
+    MAGIC = b'MOBLOOM1'
+    # magic, bit count, hash count, entries, build start (ns), size key kind
+    HEADER = struct.Struct('>8sQIQq8s')
+
+    def __init__(self, bloom_path: str, kind: str = 'content', capacity: int = 4000000,
+                 error_rate: float = 0.01):
+        """
+        Args:
+            bloom_path: File the filter is loaded from and saved to
+            kind: Duplicate check mode the size keys come from; a filter built
+                  for another mode is discarded
+            capacity: Entries the filter is sized for
+            error_rate: Target false-positive rate at capacity
+        """
+        self.bloom_path = Path(bloom_path).expanduser()
+        self.kind = kind
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.probes = 0
+        self.hits = 0
+        self.false_hits = 0
+        # Whether each album directory checked is unchanged since the build
+        self._covers: Dict[str, bool] = {}
+        self._dirty = False
+
+        self.clear()
+        try:
+            self._load()
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"⚠ Ignoring unreadable Bloom filter {self.bloom_path}: {e}")
+            self.clear()
+
+    def clear(self) -> None:
+        """Empties the filter, sized for capacity entries at error_rate."""
+        num_bits = -self.capacity * math.log(self.error_rate) / math.log(2) ** 2
+        self.num_bits = max(64, int(num_bits) // 8 * 8)
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self.bits = bytearray(self.num_bits // 8)
+        self.count = 0
+        self.built_ns = 0
+        self._covers = {}
+        self._dirty = True
+
+    @property
+    def built(self) -> bool:
+        """Whether the filter has ever been filled from the library."""
+        return self.built_ns > 0
+
+    def covers(self, album_dir: Path) -> bool:
+        """
+        Whether the filter knows every file in an album directory.
+
+        True if the directory hasn't changed since the filter was built (or
+        doesn't exist); anything else may hold files the filter has never
+        seen. Each directory is stat'ed once, until forget_covers().
+        """
+        key = str(album_dir)
+        covered = self._covers.get(key)
+        if covered is None:
+            try:
+                covered = os.stat(key).st_mtime_ns < self.built_ns
+            except FileNotFoundError:
+                covered = True
+            except OSError:
+                covered = False
+            self._covers[key] = covered
+        return covered
+
+    def forget_covers(self) -> None:
+        """Drops the covers() answers, e.g. when other programs may have changed the library."""
+        self._covers.clear()
+
+    @property
+    def stale_albums(self) -> int:
+        """Album directories checked by covers() that changed since the build."""
+        return sum(not covered for covered in self._covers.values())
+
+    def add_file(self, relative_path: str, size_key: object = None) -> None:
+        """Adds a library file by its relative path and, optionally, its size key."""
+        self._add(self._path_key(relative_path))
+        if size_key is not None:
+            self._add(self._content_key(os.path.dirname(relative_path), size_key))
+
+    def might_have_path(self, relative_path: str) -> bool:
+        """Whether a file may exist at this relative path."""
+        return self._probe(self._path_key(relative_path))
+
+    def might_have_content(self, album_path: str, size_key: object) -> bool:
+        """Whether the album directory may hold a file with this size key."""
+        return self._probe(self._content_key(album_path, size_key))
+
+    def false_positive_rate(self) -> float:
+        """Expected false-positive rate at the current fill."""
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+    def refresh(self, library_dir: Path, size_key=None, full: bool = False) -> int:
+        """
+        Adds library files changed since the last build.
+
+        Files directly in library_dir (cache, state, journal) are ignored.
+
+        Args:
+            library_dir: The destination directory
+            size_key: Callable returning a file's size key, or None for paths only
+            full: Start again from an empty filter
+
+        Returns:
+            Number of files added
+        """
+        if full:
+            self.clear()
+        since = self.built_ns
+        started = time.time_ns()
+        root = os.path.abspath(library_dir)
+        prefix_length = len(os.path.join(root, ''))
+        added = 0
+
+        stack = [(root, 0)]
+        while stack:
+            directory, dir_mtime = stack.pop()
+            try:
+                with os.scandir(directory) as it:
+                    entries = list(it)
+            except OSError:
+                continue
+
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append((entry.path, entry.stat(follow_symlinks=False).st_mtime_ns))
+                        continue
+                    if directory == root or not entry.is_file():
+                        continue
+                    if dir_mtime < since and entry.stat().st_mtime_ns < since:
+                        continue
+                    key = size_key(Path(entry.path)) if size_key is not None else None
+                except OSError:
+                    continue
+                self.add_file(entry.path[prefix_length:], key)
+                added += 1
+                if added % 10000 == 0:
+                    print(f"🌸 Bloom filter: {added} files added...")
+
+        self.built_ns = started
+        self._covers.clear()
+        self._dirty = True
+        return added
+
+    def save(self) -> None:
+        """Atomically writes the filter if it changed."""
+        if not self._dirty:
+            return
+        self.bloom_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.bloom_path.with_name(self.bloom_path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.num_bits, self.num_hashes,
+                                     self.count, self.built_ns, self.kind.encode()))
+            f.write(self.bits)
+        os.replace(tmp_path, self.bloom_path)
+        self._dirty = False
+
+    def _load(self) -> None:
+        with open(self.bloom_path, 'rb') as f:
+            header = f.read(self.HEADER.size)
+            if len(header) != self.HEADER.size:
+                raise ValueError("truncated header")
+            magic, num_bits, num_hashes, count, built_ns, kind = self.HEADER.unpack(header)
+            if magic != self.MAGIC or num_bits % 8 or not num_hashes:
+                raise ValueError("not a Bloom filter file")
+            kind = kind.rstrip(b'\0').decode()
+            if kind != self.kind:
+                raise ValueError(f"built for --dedup {kind}, rebuilding")
+            bits = bytearray(f.read())
+        if len(bits) != num_bits // 8:
+            raise ValueError("truncated bit array")
+
+        self.num_bits, self.num_hashes = num_bits, num_hashes
+        self.bits, self.count, self.built_ns = bits, count, built_ns
+        self._dirty = False
+
+    @staticmethod
+    def _path_key(relative_path: str) -> bytes:
+        return b'p\0' + relative_path.encode('utf-8', 'surrogateescape')
+
+    @staticmethod
+    def _content_key(album_path: str, size_key: object) -> bytes:
+        if not isinstance(size_key, bytes):
+            size_key = str(size_key).encode()
+        return b's\0' + album_path.encode('utf-8', 'surrogateescape') + b'\0' + size_key
+
+    def _positions(self, key: bytes) -> Iterator[int]:
+        # Double hashing: position i is h1 + i * h2
+        h1, h2 = struct.unpack('>QQ', hashlib.blake2b(key, digest_size=16).digest())
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def _add(self, key: bytes) -> None:
+        new = False
+        for position in self._positions(key):
+            mask = 1 << (position & 7)
+            if not self.bits[position >> 3] & mask:
+                self.bits[position >> 3] |= mask
+                new = True
+        if new:
+            self.count += 1
+            self._dirty = True
+
+    def _probe(self, key: bytes) -> bool:
+        self.probes += 1
+        if all(self.bits[position >> 3] & (1 << (position & 7))
+               for position in self._positions(key)):
+            self.hits += 1
+            return True
+        return False
+
+
+class DuplicateDetector:
+    """
+    Finds files with identical content already present in a destination directory.
+
+    Candidates are bucketed by size first. Only same-size files are compared
+    by a partial hash of their first and last 64 KiB, and a full streaming
+    hash is computed only when partial hashes collide, so most files are
+    never read in full.
+
+    In audio mode only the audio payload is compared: ID3/APE tags around MP3
+    frames and FLAC metadata blocks are skipped, and a FLAC STREAMINFO MD5 is
+    used directly when the encoder wrote one.
+    """
+
+    PARTIAL_BLOCK = 64 * 1024
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, audio: bool = False, index: Optional[DestinationIndex] = None):
+        self.audio = audio
+        self.index = index if index is not None else DestinationIndex()
+        # Per directory: size key -> paths of files in that bucket
+        self._buckets: Dict[Path, Dict[object, List[Path]]] = {}
+        # Memoised per stat identity (dev, ino, size, mtime_ns)
+        self._ranges: Dict[tuple, Tuple[int, int, Optional[bytes]]] = {}
+        self._partial: Dict[tuple, bytes] = {}
+        self._full: Dict[tuple, bytes] = {}
+        # Stats of source files taken while scanning, so they aren't stat'ed again
+        self._stats: Dict[Path, os.stat_result] = {}
+        self.partial_hashes = 0
+        self.full_hashes = 0
+
+    def find_duplicate(self, file_path: Path, directory: Path) -> Optional[Path]:
+        """
+        Looks for a file in directory with the same content as file_path.
+
+        Returns:
+            Path of the matching file, or None
+        """
+        return self.first_identical(file_path, self._partial_matches(file_path, directory))
+
+    def first_identical(self, file_path: Path, candidates: List[Path]) -> Optional[Path]:
+        """
+        Compares full hashes against candidates whose partial hash already matched.
+
+        Candidates that have disappeared are skipped.
+
+        Returns:
+            The first candidate with the same content, or None
+        """
+        if not candidates:
+            return None
+
+        full = self.full_hash(file_path)
+        for candidate in candidates:
+            try:
+                if self.full_hash(candidate) == full:
+                    return candidate
+            except FileNotFoundError:
+                continue
+        return None
+
+    def has_candidates(self, file_path: Path, directory: Path) -> bool:
+        """Whether directory holds any file in the same size bucket as file_path."""
+        return bool(self._load_directory(directory).get(self.size_key(file_path)))
+
+    def prefetch(self, items: List[Tuple[Path, Path]], executor) -> None:
+        """
+        Computes the full hashes that find_duplicate will need, in a process pool.
+
+        Args:
+            items: (file path, target directory) pairs about to be organized
+            executor: Executor used for the streaming hashes
+        """
+        needed = {}
+        for file_path, directory in items:
+            try:
+                matches = self._partial_matches(file_path, directory)
+            except OSError:
+                continue
+            if not matches:
+                continue
+
+            for path in [file_path] + matches:
+                key = self._stat_key(path)
+                if key in self._full or key in needed:
+                    continue
+                if self.content_range(path)[2] is not None:
+                    # full_hash() compares the STREAMINFO MD5 for these
+                    self._full[key] = self.content_range(path)[2]
+                    continue
+                needed[key] = path
+
+        jobs = [(str(path), *self.content_range(path)[:2]) for path in needed.values()]
+        for key, digest in zip(needed, executor.map(_hash_range_job, jobs)):
+            self._full[key] = digest
+            self.full_hashes += 1
+
+    def add(self, file_path: Path, directory: Optional[Path] = None) -> None:
+        """
+        Registers a file as present in directory (default: its parent).
+
+        A planned move registers the source file under its target directory,
+        so later files in the same plan are compared against it.
+        """
+        paths = self._load_directory(directory or file_path.parent).setdefault(
+            self.size_key(file_path), [])
+        if file_path not in paths:
+            paths.append(file_path)
+
+    def known_stat(self, file_path: Path, st: os.stat_result) -> None:
+        """Supplies a stat result the scanner already took for file_path."""
+        self._stats[file_path] = st
+
+    def replace(self, old_path: Path, new_path: Path) -> None:
+        """Points a registered entry at the file's new location after a move."""
+        self._stats.pop(old_path, None)
+        for paths in self._buckets.get(new_path.parent, {}).values():
+            if old_path in paths:
+                paths[paths.index(old_path)] = new_path
+                return
+
+    def discard(self, file_path: Path, directory: Path) -> None:
+        """Forgets a planned entry whose move didn't happen."""
+        self._stats.pop(file_path, None)
+        for paths in self._buckets.get(directory, {}).values():
+            if file_path in paths:
+                paths.remove(file_path)
+                return
+
+    def size_key(self, file_path: Path) -> object:
+        """Bucket key: the compared length, or the FLAC audio MD5 when known."""
+        start, end, md5 = self.content_range(file_path)
+        return md5 if md5 is not None else end - start
+
+    def content_range(self, file_path: Path) -> Tuple[int, int, Optional[bytes]]:
+        """
+        Byte range of the file that is compared.
+
+        Returns:
+            Tuple of (start, end, STREAMINFO MD5 or None)
+        """
+        key = self._stat_key(file_path)
+        cached = self._ranges.get(key)
+        if cached is None:
+            if self.audio:
+                cached = audio_payload_range(file_path)
+            else:
+                cached = (0, key[2], None)
+            self._ranges[key] = cached
+        return cached
+
+    def partial_hash(self, file_path: Path) -> bytes:
+        """Hash of the first and last PARTIAL_BLOCK bytes of the compared range."""
+        key = self._stat_key(file_path)
+        digest = self._partial.get(key)
+        if digest is None:
+            start, end, md5 = self.content_range(file_path)
+            digest = md5 if md5 is not None else self._hash_partial(file_path, start, end)
+            self._partial[key] = digest
+        return digest
+
+    def full_hash(self, file_path: Path) -> bytes:
+        """Streaming hash of the whole compared range."""
+        key = self._stat_key(file_path)
+        digest = self._full.get(key)
+        if digest is None:
+            start, end, md5 = self.content_range(file_path)
+            if md5 is not None:
+                digest = md5
+            else:
+                digest = hash_file_range(file_path, start, end, self.CHUNK_SIZE)
+                self.full_hashes += 1
+            self._full[key] = digest
+        return digest
+
+    def _stat_key(self, file_path: Path) -> tuple:
+        st = self._stats.get(file_path)
+        if st is None:
+            st = file_path.stat()
+        return st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns
+
+    def _partial_matches(self, file_path: Path, directory: Path) -> List[Path]:
+        candidates = self._load_directory(directory).get(self.size_key(file_path))
+        if not candidates:
+            return []
+
+        partial = self.partial_hash(file_path)
+        return [c for c in candidates if self.partial_hash(c) == partial]
+
+    def _hash_partial(self, file_path: Path, start: int, end: int) -> bytes:
+        self.partial_hashes += 1
+        hasher = hashlib.blake2b(digest_size=20)
+
+        with open(file_path, 'rb') as f:
+            f.seek(start)
+            hasher.update(f.read(min(self.PARTIAL_BLOCK, end - start)))
+            tail_start = max(start + self.PARTIAL_BLOCK, end - self.PARTIAL_BLOCK)
+            if tail_start < end:
+                f.seek(tail_start)
+                hasher.update(f.read(end - tail_start))
+        return hasher.digest()
+
+    def _load_directory(self, directory: Path) -> Dict[object, List[Path]]:
+        buckets = self._buckets.get(directory)
+        if buckets is not None:
+            return buckets
+
+        buckets = {}
+        for name, is_dir in self.index.listing(directory).items():
+            if is_dir:
+                continue
+            path = directory / name
+            try:
+                key = self.size_key(path)
+            except OSError:
+                continue  # Dangling symlink or removed since it was listed
+            buckets.setdefault(key, []).append(path)
+
+        self._buckets[directory] = buckets
+        return buckets
+
+    def reset(self) -> None:
+        """Forgets the per-directory buckets and known stats; memoised hashes are kept."""
+        self._buckets.clear()
+        self._stats.clear()
+
+
+def _skip_id3v2(f, start: int) -> int:
+    """Returns the offset just past any ID3v2 tags found at start."""
+    while True:
+        f.seek(start)
+        header = f.read(10)
+        if len(header) < 10 or header[:3] != b'ID3':
+            return start
+        # Tag size is a 28-bit syncsafe integer that excludes the 10-byte header
+        size = ((header[6] & 0x7f) << 21 | (header[7] & 0x7f) << 14
+                | (header[8] & 0x7f) << 7 | (header[9] & 0x7f))
+        start += 10 + size + (10 if header[5] & 0x10 else 0)  # footer flag
+
+
+def _strip_trailing_tags(f, start: int, end: int) -> int:
+    """Returns the end offset once ID3v1, APEv2 and Lyrics3v2 trailers are removed."""
+    if end - start >= 128:
+        f.seek(end - 128)
+        if f.read(3) == b'TAG':
+            end -= 128
+
+    while end - start >= 32:
+        f.seek(end - 32)
+        footer = f.read(32)
+        if footer[:8] == b'APETAGEX':
+            size = int.from_bytes(footer[12:16], 'little')
+            if size < 32 or size > end - start:
+                break  # Corrupt footer; its size includes the footer itself
+            has_header = int.from_bytes(footer[20:24], 'little') & 0x80000000
+            end -= size + (32 if has_header else 0)
+            continue
+
+        f.seek(end - 15)
+        trailer = f.read(15)
+        if trailer[6:] == b'LYRICS200' and trailer[:6].isdigit():
+            end -= int(trailer[:6]) + 15
+            continue
+        break
+
+    return max(start, end)
+
+
+def audio_payload_range(file_path: Path) -> Tuple[int, int, Optional[bytes]]:
+    """
+    Locates the audio payload of an MP3 or FLAC file, skipping tag blocks.
+
+    Other formats are compared as a whole.
+
+    Returns:
+        Tuple of (start, end, STREAMINFO MD5 or None)
+    """
+    size = file_path.stat().st_size
+    suffix = file_path.suffix.lower()
+
+    with open(file_path, 'rb') as f:
+        if suffix == '.mp3':
+            start = _skip_id3v2(f, 0)
+            return start, _strip_trailing_tags(f, start, size), None
+
+        if suffix == '.flac':
+            pos = _skip_id3v2(f, 0)
+            f.seek(pos)
+            if f.read(4) != b'fLaC':
+                return 0, size, None
+            pos += 4
+            md5 = None
+
+            while True:
+                header = f.read(4)
+                if len(header) < 4:
+                    return 0, size, None
+                block_type = header[0] & 0x7f
+                length = int.from_bytes(header[1:4], 'big')
+                if block_type == 0 and length >= 34:
+                    streaminfo = f.read(34)
+                    if streaminfo[18:34] != bytes(16):  # all zeros means "not computed"
+                        md5 = streaminfo[18:34]
+                pos += 4 + length
+                f.seek(pos)
+                if header[0] & 0x80:  # last metadata block
+                    break
+
+            return pos, size, md5
+
+    return 0, size, None
+
+
+def hash_file_range(file_path: Path, start: int, end: int,
+                    chunk_size: int = 1024 * 1024) -> bytes:
+    """
+    Hashes bytes [start, end) of a file with bounded memory.
+
+    Returns:
+        The blake2b digest of the range
+    """
+    hasher = hashlib.blake2b(digest_size=20)
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            hasher.update(chunk)
+            remaining -= len(chunk)
+    return hasher.digest()
+
+
+# Tag frames and atoms holding the fields read_metadata() needs
+ID3_TEXT_FRAMES = {b'TPE2': 'albumartist', b'TPE1': 'artist', b'TALB': 'album',
+                   b'TP2': 'albumartist', b'TP1': 'artist', b'TAL': 'album'}
+MP4_TEXT_ATOMS = {b'aART': 'albumartist', b'\xa9ART': 'artist', b'\xa9alb': 'album'}
+TAG_FIELDS = ('albumartist', 'artist', 'album')
+
+
+def read_tags_fast(file_path: Union[Path, str], use_mmap: bool = True) -> Optional[Dict[str, str]]:
+    """
+    Reads albumartist, artist and album by parsing only the tag headers.
+
+    Handles ID3v2 (MP3), FLAC Vorbis comments and MP4 ilst atoms. Frames,
+    blocks and atoms that aren't needed, such as embedded cover art, are
+    skipped rather than read.
+
+    The file is memory-mapped and parsed through memoryview slices, so only
+    the pages holding tag headers are touched and text is decoded straight
+    from the mapping. Files that can't be mapped are read with seek()/read().
+
+    Args:
+        file_path: Path to the music file
+        use_mmap: Map the file; otherwise always use seek()/read()
+
+    Returns:
+        Dict with the fields found (first value of each), or None when the
+        format or an unusual encoding isn't handled and mutagen should be used
+    """
+    parser = _TAG_PARSERS.get(os.path.splitext(str(file_path))[1].lower())
+    if parser is None:
+        return None
+
+    try:
+        with open(file_path, 'rb') as f:
+            mapped = None
+            if use_mmap:
+                try:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                except (OSError, ValueError):
+                    pass  # empty file, or a filesystem without mmap
+
+            if mapped is None:
+                return parser(_FileBuffer(f))
+            with mapped:
+                # Parse errors are handled here: a traceback keeps slices of
+                # the mapping alive, and it can't be closed while they exist
+                try:
+                    return parser(memoryview(mapped))
+                except (ValueError, IndexError):
+                    return None
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _FileBuffer:
+    """Slice access to an open file, for parsers written against a memoryview."""
+
+    def __init__(self, f):
+        self.f = f
+        self.size = os.fstat(f.fileno()).st_size
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, index: slice) -> bytes:
+        start, stop, _ = index.indices(self.size)
+        self.f.seek(start)
+        return self.f.read(max(0, stop - start))
+
+
+def _syncsafe(data) -> int:
+    return (data[0] & 0x7f) << 21 | (data[1] & 0x7f) << 14 | (data[2] & 0x7f) << 7 | (data[3] & 0x7f)
+
+
+def _id3v2_end(buf, pos: int) -> int:
+    """Offset just past any ID3v2 tags at pos (the buffer flavour of _skip_id3v2)."""
+    while True:
+        header = buf[pos:pos + 10]
+        if len(header) < 10 or header[:3] != b'ID3':
+            return pos
+        pos += 10 + _syncsafe(header[6:10]) + (10 if header[5] & 0x10 else 0)
+
+
+def _read_id3v2_tags(buf) -> Optional[Dict[str, str]]:
+    header = buf[0:10]
+    if len(header) < 10 or header[:3] != b'ID3':
+        return None
+    version, flags = header[3], header[5]
+    if version not in (2, 3, 4) or flags & 0x80:  # unsynchronised tags are left to mutagen
+        return None
+
+    end = min(10 + _syncsafe(header[6:10]), len(buf))
+    pos = 10
+    if flags & 0x40 and version > 2:  # extended header
+        size = buf[pos:pos + 4]
+        pos += _syncsafe(size) if version == 4 else 4 + int.from_bytes(size, 'big')
+
+    id_length, header_length = (3, 6) if version == 2 else (4, 10)
+    tags = {}
+    while pos + header_length <= end and len(tags) < len(TAG_FIELDS):
+        frame = buf[pos:pos + header_length]
+        frame_id = bytes(frame[:id_length])
+        if frame_id[0] == 0:
+            break  # padding
+        if not frame_id.isalnum():
+            return None
+        if version == 2:
+            size = int.from_bytes(frame[3:6], 'big')
+        elif version == 4:
+            size = _syncsafe(frame[4:8])
+        else:
+            size = int.from_bytes(frame[4:8], 'big')
+        pos += header_length
+
+        field = ID3_TEXT_FRAMES.get(frame_id)
+        if field is not None and field not in tags and size > 1:
+            if version > 2 and frame[9]:  # compressed, encrypted, grouped...
+                return None
+            tags[field] = _decode_id3_text(buf[pos:pos + size])
+        pos += size  # everything else, cover art included, is skipped
+
+    return tags
+
+
+def _decode_id3_text(data) -> str:
+    """First value of an ID3 text frame, decoded without copying the frame."""
+    encoding, body = data[0], data[1:]
+    if encoding == 0:
+        text = str(body, 'latin-1')
+    elif encoding in (1, 2):
+        text = str(body[:len(body) // 2 * 2], 'utf-16' if encoding == 1 else 'utf-16-be')
+    elif encoding == 3:
+        text = str(body, 'utf-8')
+    else:
+        raise ValueError(f"unknown ID3 text encoding {encoding}")
+    return text.split('\0', 1)[0]
+
+
+def _read_flac_tags(buf) -> Optional[Dict[str, str]]:
+    pos = _id3v2_end(buf, 0)
+    if buf[pos:pos + 4] != b'fLaC':
+        return None
+    pos += 4
+
+    while True:
+        header = buf[pos:pos + 4]
+        if len(header) < 4:
+            return None
+        length = int.from_bytes(header[1:4], 'big')
+        pos += 4
+        if header[0] & 0x7f == 4:  # VORBIS_COMMENT
+            return _parse_vorbis_comment(buf[pos:pos + length])
+        if header[0] & 0x80:  # last metadata block
+            return {}
+        pos += length  # STREAMINFO, PICTURE, PADDING...
+
+
+def _parse_vorbis_comment(data) -> Dict[str, str]:
+    pos = 4 + int.from_bytes(data[0:4], 'little')  # vendor string
+    count = int.from_bytes(data[pos:pos + 4], 'little')
+    pos += 4
+    longest = max(len(field) for field in TAG_FIELDS) + 1
+
+    tags = {}
+    for _ in range(count):
+        # The count comes from the file, so a corrupt one must not outlive the block
+        if pos + 4 > len(data):
+            raise ValueError("truncated Vorbis comment")
+        length = int.from_bytes(data[pos:pos + 4], 'little')
+        start, pos = pos + 4, pos + 4 + length
+        if pos > len(data):
+            raise ValueError("truncated Vorbis comment")
+        # Only the head of each comment is copied to find its key
+        key, equals, _ = bytes(data[start:start + min(length, longest)]).partition(b'=')
+        field = key.decode('ascii', 'replace').lower()
+        if equals and field in TAG_FIELDS and field not in tags:
+            tags[field] = str(data[start + len(key) + 1:pos], 'utf-8', 'replace')
+    return tags
+
+
+def _mp4_atoms(buf, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """Yields (type, payload start, payload end) for the atoms in [start, end)."""
+    pos = start
+    while pos + 8 <= end:
+        header = buf[pos:pos + 8]
+        size, header_size = int.from_bytes(header[:4], 'big'), 8
+        if size == 1:
+            size, header_size = int.from_bytes(buf[pos + 8:pos + 16], 'big'), 16
+        elif size == 0:
+            size = end - pos
+        if size < header_size:
+            raise ValueError("corrupt MP4 atom")
+        yield bytes(header[4:8]), pos + header_size, min(pos + size, end)
+        pos += size
+
+
+def _find_mp4_atom(buf, start: int, end: int, kind: bytes) -> Optional[Tuple[int, int]]:
+    for atom, atom_start, atom_end in _mp4_atoms(buf, start, end):
+        if atom == kind:
+            return atom_start, atom_end
+    return None
+
+
+def _read_mp4_tags(buf) -> Optional[Dict[str, str]]:
+    if buf[4:8] != b'ftyp':
+        return None
+
+    span = (0, len(buf))
+    for kind in (b'moov', b'udta', b'meta', b'ilst'):
+        span = _find_mp4_atom(buf, *span, kind)
+        if span is None:
+            return {}
+        if kind == b'meta' and buf[span[0] + 4:span[0] + 8] != b'hdlr':
+            # A full atom (version and flags first), except in QuickTime files
+            span = (span[0] + 4, span[1])
+
+    tags = {}
+    for atom, start, end in _mp4_atoms(buf, *span):
+        field = MP4_TEXT_ATOMS.get(atom)
+        if field is None or field in tags:
+            continue
+        data = _find_mp4_atom(buf, start, end, b'data')
+        if data is None:
+            continue
+        if int.from_bytes(buf[data[0] + 1:data[0] + 4], 'big') != 1:  # only UTF-8 text
+            return None
+        tags[field] = str(buf[data[0] + 8:data[1]], 'utf-8')
+    return tags
+
+
+_TAG_PARSERS = {'.mp3': _read_id3v2_tags, '.flac': _read_flac_tags, '.m4a': _read_mp4_tags}
+
+
+FICLONE = 0x40049409  # ioctl sharing a file's extents (btrfs, XFS, ...)
+
+# errnos meaning "this filesystem pair can't do that kind of copy"
+COPY_UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL,
+                           errno.ENOSYS, errno.EPERM, errno.EBADF}
+
+COPY_CHUNK_SIZE = 1 << 30
+
+# Strategies found unsupported, by (source st_dev, destination st_dev)
+_unsupported_copies: Dict[Tuple[int, int], Set[str]] = {}
+
+
+class CopyResult(NamedTuple):
+    """How copy_file() copied one file."""
+    strategy: str
+    size: int
+    seconds: float
+
+    @property
+    def rate(self) -> float:
+        """Throughput in MiB/s."""
+        return self.size / 1024 ** 2 / self.seconds if self.seconds > 0 else 0.0
+
+
+class _CopyUnsupported(Exception):
+    """A copy strategy failed before writing anything; try the next one."""
+
+
+def _unsupported(e: OSError) -> Exception:
+    """The exception to raise for e: a fallback signal, or e itself."""
+    return _CopyUnsupported() if e.errno in COPY_UNSUPPORTED_ERRNOS else e
+
+
+def _copy_reflink(fsrc, fdst) -> None:
+    if fcntl is None:
+        raise _CopyUnsupported()
+    try:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+    except OSError as e:
+        raise _unsupported(e)
+
+
+def _copy_file_range(fsrc, fdst) -> None:
+    if not hasattr(os, 'copy_file_range'):
+        raise _CopyUnsupported()
+    copied = 0
+    while True:
+        try:
+            n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), COPY_CHUNK_SIZE)
+        except OSError as e:
+            raise _unsupported(e) if copied == 0 else e
+        if n == 0:
+            return
+        copied += n
+
+
+def _copy_sendfile(fsrc, fdst) -> None:
+    if not hasattr(os, 'sendfile'):
+        raise _CopyUnsupported()
+    copied = 0
+    while True:
+        try:
+            n = os.sendfile(fdst.fileno(), fsrc.fileno(), None, COPY_CHUNK_SIZE)
+        except OSError as e:
+            raise _unsupported(e) if copied == 0 else e
+        if n == 0:
+            return
+        copied += n
+
+
+def _copy_buffered(fsrc, fdst) -> None:
+    shutil.copyfileobj(fsrc, fdst, 1024 * 1024)
+
+
+ALIGNED_BUFFER_SIZE = 8 * 1024 * 1024
+
+# Page-aligned copy buffers, one per copying thread
+_copy_buffers = threading.local()
+
+
+def _copy_preallocated(fsrc, fdst) -> None:
+    """Copies into a preallocated file through a reused, page-aligned buffer."""
+    size = os.fstat(fsrc.fileno()).st_size
+    if size and hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(fdst.fileno(), 0, size)
+        except OSError as e:
+            if e.errno not in COPY_UNSUPPORTED_ERRNOS:
+                raise
+    buffer = getattr(_copy_buffers, 'buffer', None)
+    if buffer is None:
+        buffer = _copy_buffers.buffer = mmap.mmap(-1, ALIGNED_BUFFER_SIZE)
+    with memoryview(buffer) as view:
+        while True:
+            n = fsrc.readinto(view)
+            if not n:
+                break
+            fdst.write(view[:n])
+    fdst.truncate()  # In case the source shrank after preallocation
+
+
+def _fadvise(f, advice: str) -> None:
+    """posix_fadvise over a whole file, where the platform has it."""
+    if hasattr(os, 'posix_fadvise'):
+        os.posix_fadvise(f.fileno(), 0, 0, getattr(os, advice))
+
+
+COPY_STRATEGIES = [('reflink', _copy_reflink), ('copy_file_range', _copy_file_range),
+                   ('sendfile', _copy_sendfile), ('buffered', _copy_buffered)]
+
+# Strategies for copies that must not fill the page cache
+DROP_CACHE_STRATEGIES = [('reflink', _copy_reflink), ('preallocated', _copy_preallocated)]
+
+
+def copy_file(source: Path, destination: Path, drop_cache: bool = False) -> CopyResult:
+    """
+    Copies a file's data and metadata, like shutil.copy2, as cheaply as possible.
+
+    Tries a FICLONE reflink (no data copied at all), then copy_file_range
+    (in-kernel, server-side on NFS/SMB), then sendfile, then a buffered
+    read/write loop. Strategies that fail before copying anything are
+    remembered per device pair and not tried again.
+
+    Args:
+        drop_cache: Keep the copy out of the page cache: after a reflink
+                    attempt, read sequentially into a preallocated file
+                    through a large page-aligned buffer, then write the copy
+                    back and drop both files' cached pages
+
+    Returns:
+        The strategy used, bytes copied and time taken
+    """
+    started = time.monotonic()
+    with open(source, 'rb') as fsrc:
+        # Never overwrite: a destination that appeared since planning isn't ours
+        fdst = open(destination, 'xb')
+        try:
+            with fdst:
+                if drop_cache:
+                    _fadvise(fsrc, 'POSIX_FADV_SEQUENTIAL')
+                devices = (os.fstat(fsrc.fileno()).st_dev, os.fstat(fdst.fileno()).st_dev)
+                unsupported = _unsupported_copies.setdefault(devices, set())
+                for strategy, copy in DROP_CACHE_STRATEGIES if drop_cache else COPY_STRATEGIES:
+                    if strategy in unsupported:
+                        continue
+                    try:
+                        copy(fsrc, fdst)
+                        break
+                    except _CopyUnsupported:
+                        unsupported.add(strategy)
+                if drop_cache:
+                    # Dirty pages can't be dropped until they are written back
+                    fdst.flush()
+                    getattr(os, 'fdatasync', os.fsync)(fdst.fileno())
+                    _fadvise(fsrc, 'POSIX_FADV_DONTNEED')
+                    _fadvise(fdst, 'POSIX_FADV_DONTNEED')
+            shutil.copystat(source, destination)
+        except BaseException:
+            os.unlink(destination)
+            raise
+    return CopyResult(strategy, os.stat(destination).st_size, time.monotonic() - started)
+
+
+class SourceFile(NamedTuple):
+    """A music or .spotdl file found while scanning the source tree."""
+    path: str
+    name: str
+    stat: os.stat_result
+
+
+class PlannedMove(NamedTuple):
+    """
+    One step of an organization plan.
+
+    action is 'move' (source to destination), 'duplicate' (delete source,
+    destination holds the same content), 'delete' (a .spotdl file) or
+    'rename_dir' (a whole source folder becomes the album folder; files is
+    the number of music files in it). size and mtime_ns describe the source
+    when it was planned, so a stored plan can detect files that changed
+    before it was applied.
+    """
+    action: str
+    source: str
+    destination: Optional[str] = None
+    artist: str = ''
+    album: str = ''
+    size: int = 0
+    mtime_ns: int = 0
+    files: int = 0
 
 
 class MusicOrganizer:
     """Main class for organizing music files."""
 
-    def __init__(self, source_dir: str, destination_dir: str):
-        self.source_dir = Path(source_dir)
-        self.destination_dir = Path(destination_dir)
-        self.music_extensions = {'.mp3', '.m4a', '.flac', '.wav', '.ogg', '.wma'}
+    def __init__(self, source_dir: str, destination_dir: str,
+                 cache_path: Optional[str] = None, cache_size: int = 200000,
+                 workers: int = 1, batch_size: int = 64, dedup: str = 'content',
+                 incremental: bool = False, state_path: Optional[str] = None,
+                 journal_path: Optional[str] = None, resume: bool = False,
+                 bloom_path: Optional[str] = None, bloom_refresh: bool = False,
+                 bloom_rebuild: bool = False, catalog_path: Optional[str] = None,
+                 spotdl_metadata: bool = False, pipeline: bool = False,
+                 queue_size: int = 256, io_concurrency: Optional[int] = None,
+                 io_queue_depth: int = 4,
+                 io_pairs: Optional[List[Tuple[str, str, int, int]]] = None,
+                 drop_page_cache: bool = False, link_mode: Optional[str] = None,
+                 read_only: bool = False):
+        self.source_dir = Path(source_dir)
+        self.destination_dir = Path(destination_dir)
+        self.music_extensions = {'.mp3', '.m4a', '.flac', '.wav', '.ogg', '.wma'}
+
+        # Metadata extraction runs in a process pool when workers > 1
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+
+        # Optional streaming pipeline, with bounded queues between its stages
+        self.pipeline = pipeline
+        self.queue_size = max(1, queue_size)
+
+        # Optional persistent metadata cache
+        self.cache = None
+        if cache_path:
+            try:
+                self.cache = MetadataCache(cache_path, cache_size)
+            except (sqlite3.Error, OSError) as e:
+                print(f"⚠ Metadata cache disabled ({cache_path}): {e}")
+
+        # Duplicate detection: 'name' trusts matching filenames, 'content'
+        # compares whole files and 'audio' compares only the audio payload
+        self.dedup = dedup
+        self.index = DestinationIndex()
+        self.detector = None
+        if dedup != 'name':
+            self.detector = DuplicateDetector(audio=dedup == 'audio', index=self.index)
+
+        # Optional Bloom filter over the library, so that most files are
+        # planned without touching their album directory
+        self.bloom = None
+        if bloom_path is not None:
+            self.bloom = DestinationBloom(
+                bloom_path or self.destination_dir / '.music-organizer-bloom', dedup)
+        self.bloom_refresh = bloom_refresh
+        self.bloom_rebuild = bloom_rebuild
+
+        # Optional catalog of the organized library. Its hashes come from a
+        # detector of its own kind, shared with duplicate checks when they match
+        self.catalog = None
+        self.catalog_hasher = None
+        if catalog_path is not None:
+            catalog_path = catalog_path or self.destination_dir / '.music-organizer-catalog.db'
+            try:
+                # A dry run reads an existing catalog but never creates one
+                if not read_only or Path(catalog_path).expanduser().exists():
+                    self.catalog = LibraryCatalog(catalog_path,
+                                                  'audio' if dedup == 'audio' else 'content',
+                                                  read_only=read_only)
+            except (sqlite3.Error, OSError) as e:
+                print(f"⚠ Library catalog disabled ({catalog_path}): {e}")
+        if self.catalog is not None:
+            audio = self.catalog.hash_kind == 'audio'
+            if self.detector is not None and self.detector.audio == audio:
+                self.catalog_hasher = self.detector
+            else:
+                self.catalog_hasher = DuplicateDetector(audio=audio, index=self.index)
+        # Planned moves by (album directory, partial hash), for catalog duplicate checks
+        self._planned_hashes: Dict[Tuple[Path, bytes], List[Path]] = {}
+        # Album folders already checked against the catalog
+        self._catalog_checked: Set[Path] = set()
+
+        # Incremental mode skips directories unchanged since the last run
+        self.scan_state = None
+        if incremental:
+            self.scan_state = ScanState(
+                state_path or self.destination_dir / '.music-organizer-state.json')
+
+        # Source directories that files were removed from, for cleanup
+        self._touched_dirs: Set[Path] = set()
+
+        # Planning state: names reserved per album directory by planned moves
+        # (on-disk names come from the index) and source path -> planned destination
+        self._reserved_names: Dict[Path, Set[str]] = {}
+        self._planned_paths: Dict[Path, Path] = {}
+
+        # Planned steps are applied in batches, grouped by album directory
+        self.apply_batch_size = 64
+
+        # Optional write-ahead journal of moves; resume replays a crashed run
+        self.journal = None
+        self.resume_journal = resume
+        self._uncommitted_copies: List[Tuple[int, Path, Path]] = []
+        if journal_path is not None or resume:
+            self.journal = MoveJournal(
+                journal_path or self.destination_dir / '.music-organizer-journal.jsonl')
+
+        # Directories listed so far by rebuild_catalog()
+        self._walked_dirs = 0
+
+        # Cached same-device checks, keyed by (source dir, destination dir)
+        self._same_device = {}
+
+        # Copies can be kept out of the page cache, to spare other workloads
+        self.drop_page_cache = drop_page_cache
+
+        # Link mode ('hardlink', 'symlink' or 'reflink') builds the library
+        # from links and leaves every source file where it is
+        self.link_mode = link_mode
+
+        # Optional scheduler running cross-device copies concurrently, with
+        # limits per (source device, destination device) pair
+        self.copies = None
+        if io_concurrency is not None or io_pairs:
+            pairs = {(_device_of(Path(src).expanduser()), _device_of(Path(dst).expanduser())):
+                     (max(1, limit), max(0, depth))
+                     for src, dst, limit, depth in io_pairs or ()}
+            self.copies = CopyScheduler(io_concurrency or 2, io_queue_depth, pairs)
+
+        # A new catalog for an empty library knows every file in it
+        if self.catalog is not None and self.catalog.created:
+            if not any(self.index.listing(self.destination_dir).values()):
+                self.catalog.set_complete(True)
+
+        # Optionally take (artist, album) from .spotdl sidecars instead of tags;
+        # a sidecar is then kept until every track in its folder is organized
+        self.spotdl_metadata = spotdl_metadata
+        self._sidecar_names: Dict[str, List[str]] = {}
+        self._sidecar_lookup: Tuple[Optional[str], Dict[str, Tuple[str, str]]] = (None, {})
+        self._failed_dirs: Set[str] = set()
+
+        # Statistics
+        self.stats = {
+            'processed': 0,
+            'duplicates': 0,
+            'spotdl_deleted': 0,
+            'errors': 0,
+            'renamed': 0,
+            'copied': 0,
+            'linked': 0,
+            'spotdl_metadata': 0
+        }
+        # Files, bytes and seconds copied, by copy_file() strategy
+        self.copy_totals: Dict[str, List] = {}
+
+    @staticmethod
+    def sanitize_filename(name: str) -> str:
+        """
+        Sanitizes a string to be used as a directory name.
+
+        Args:
+            name: The string to sanitize
+
+        Returns:
+            Sanitized string safe for use as directory name
+        """
+        if not name or not name.strip():
+            return "Unknown"
+
+        # Remove invalid characters for cross-platform compatibility
+        invalid_chars_pattern = r'[<>:"/\\|?*]'
+        sanitized = re.sub(invalid_chars_pattern, '_', name)
+
+        # Remove leading/trailing whitespace and dots (Windows compatibility)
+        sanitized = sanitized.strip(' .')
+
+        # Truncate if too long (common filesystem limit)
+        if len(sanitized) > 200:
+            sanitized = sanitized[:200].rstrip()
+
+        return sanitized or "Unknown"
+
+    def extract_metadata(self, file_path: Union[Path, str],
+                         st: Optional[os.stat_result] = None) -> Tuple[str, str]:
+        """
+        Extracts artist and album information from music file metadata.
+
+        Args:
+            file_path: Path to the music file
+            st: Stat result for the file, if already known
+
+        Returns:
+            Tuple of (artist, album)
+        """
+        sidecar = self.lookup_spotdl_metadata(file_path)
+        if sidecar is not None:
+            return sidecar
+
+        key, cached = self.lookup_cached_metadata(file_path, st)
+        if cached is not None:
+            return cached
+
+        artist, album = self.read_metadata(file_path)
+        self.store_cached_metadata(file_path, key, artist, album)
+        return artist, album
+
+    def lookup_spotdl_metadata(self, file_path: Union[Path, str]) -> Optional[Tuple[str, str]]:
+        """
+        Looks a track up in the .spotdl sidecars of its folder, if enabled.
+
+        Each folder's sidecars are parsed once, into a lookup keyed by the
+        "{artists} - {title}" names spotDL gives its downloads.
+
+        Returns:
+            Tuple of (artist, album), or None if no sidecar describes the track
+        """
+        if not self.spotdl_metadata:
+            return None
+
+        directory, name = os.path.split(str(file_path))
+        loaded_for, lookup = self._sidecar_lookup
+        if loaded_for != directory:
+            lookup = self._load_sidecar_lookup(directory)
+            self._sidecar_lookup = (directory, lookup)
+
+        metadata = lookup.get(_track_key(os.path.splitext(name)[0]))
+        if metadata is not None:
+            self.stats['spotdl_metadata'] += 1
+        return metadata
+
+    def _load_sidecar_lookup(self, directory: str) -> Dict[str, Tuple[str, str]]:
+        # The scanner records sidecar names as it lists a folder; other callers list it here
+        names = self._sidecar_names.pop(directory, None)
+        if names is None:
+            try:
+                names = [name for name in os.listdir(directory) if name.endswith('.spotdl')]
+            except OSError:
+                names = []
+
+        lookup = {}
+        for name in sorted(names):
+            for song in read_spotdl_songs(os.path.join(directory, name)):
+                artists = [str(artist) for artist in song.get('artists') or []]
+                artist = str(song.get('artist') or (artists[0] if artists else ''))
+                title = str(song.get('name') or '')
+                album_artist = self.sanitize_filename(str(song.get('album_artist') or artist))
+                album = self.sanitize_filename(str(song.get('album_name') or ''))
+                if not (title and album_artist and album):
+                    continue
+                for track_artists in (', '.join(artists), artist):
+                    lookup.setdefault(_track_key(f"{track_artists} - {title}"),
+                                      (album_artist, album))
+        return lookup
+
+    def lookup_cached_metadata(self, file_path: Union[Path, str],
+                               st: Optional[os.stat_result] = None
+                               ) -> Tuple[Optional[tuple], Optional[Tuple[str, str]]]:
+        """
+        Consults the metadata cache for a file.
+
+        Returns:
+            Tuple of (stat key, cached (artist, album)); either may be None
+        """
+        if self.cache is None:
+            return None, None
+
+        try:
+            # DirEntry.stat() leaves st_ino and st_dev at 0 on Windows
+            if st is None or not st.st_ino:
+                st = os.stat(file_path)
+            key = MetadataCache.stat_key(st)
+            return key, self.cache.get(key)
+        except (sqlite3.Error, OSError):
+            return None, None
+
+    def store_cached_metadata(self, file_path: Union[Path, str], key: Optional[tuple],
+                              artist: str, album: str) -> None:
+        """Records freshly read metadata in the cache, if enabled."""
+        if self.cache is None or key is None:
+            return
+
+        try:
+            self.cache.put(key, artist, album)
+        except sqlite3.Error as e:
+            print(f"⚠ Couldn't cache metadata for {os.path.basename(file_path)}: {e}")
+
+    @staticmethod
+    def read_metadata(file_path: Union[Path, str]) -> Tuple[str, str]:
+        """
+        Reads artist and album tags directly from the file.
+
+        Tag headers are parsed by read_tags_fast() when it finds both fields;
+        otherwise the file is opened with mutagen.
+
+        Args:
+            file_path: Path to the music file
+
+        Returns:
+            Tuple of (artist, album)
+        """
+        try:
+            # Parse just the tag headers when possible; mutagen handles the rest
+            tags = read_tags_fast(file_path)
+            if not tags or not tags.get('album') or not (tags.get('albumartist') or tags.get('artist')):
+                audio = File(str(file_path), easy=True)
+
+                if audio is None:
+                    return "Unknown Artist", "Unknown Album"
+
+                tags = {field: str(audio[field][0]) for field in TAG_FIELDS
+                        if field in audio and audio[field][0]}
+
+            # Prioritize albumartist over artist for better compilation handling
+            artist = tags.get('albumartist') or tags.get('artist') or ""
+            album = tags.get('album') or ""
+
+            # Sanitize the extracted metadata
+            artist = MusicOrganizer.sanitize_filename(artist) or "Unknown Artist"
+            album = MusicOrganizer.sanitize_filename(album) or "Unknown Album"
+
+            return artist, album
+
+        except Exception as e:
+            print(f"Warning: Couldn't read metadata for {os.path.basename(file_path)}: {e}")
+            return "Unknown Artist", "Unknown Album"
+
+    @staticmethod
+    def read_audio_info(file_path: Union[Path, str]) -> Tuple[Optional[float], Optional[int]]:
+        """
+        Reads stream info for the catalog.
+
+        Returns:
+            Tuple of (duration in seconds, bitrate in bit/s); either may be None
+        """
+        try:
+            info = getattr(File(str(file_path)), 'info', None)
+        except Exception:
+            return None, None
+        if info is None:
+            return None, None
+        return getattr(info, 'length', None), getattr(info, 'bitrate', None) or None
+
+    def is_music_file(self, file_path: Path) -> bool:
+        """Check if file is a supported music format."""
+        return file_path.suffix.lower() in self.music_extensions
+
+    def is_music_name(self, name: str) -> bool:
+        """Same as is_music_file, but works on a bare filename string."""
+        return os.path.splitext(name)[1].lower() in self.music_extensions
+
+    def handle_spotdl_file(self, file_path: Path) -> bool:
+        """
+        Handles .spotdl files by deleting them.
+
+        Returns:
+            True if successfully deleted, False otherwise
+        """
+        try:
+            file_path.unlink()
+            self._touched_dirs.add(file_path.parent)
+            print(f"✓ Deleted .spotdl file: {file_path.name}")
+            self.stats['spotdl_deleted'] += 1
+            return True
+        except Exception as e:
+            print(f"✗ Error deleting .spotdl file {file_path.name}: {e}")
+            self.stats['errors'] += 1
+            return False
+
+    def source_failed(self, path: str) -> None:
+        """
+        Notes a source file that wasn't organized.
+
+        Its folder keeps its .spotdl sidecars, and in incremental mode the
+        file (and those sidecars) are picked up again by the next run.
+        """
+        directory, name = os.path.split(path)
+        self._failed_dirs.add(directory)
+        if self.scan_state is not None:
+            rel_dir = os.path.relpath(directory, self.source_dir)
+            names = [name]
+            record = self.scan_state.current.get(rel_dir)
+            if self.spotdl_metadata and record is not None:
+                names.extend(sidecar for sidecar in record['files']
+                             if sidecar.endswith('.spotdl'))
+            self.scan_state.forget(rel_dir, names)
+
+    @staticmethod
+    def keep_sidecar(name: str) -> None:
+        """Reports a .spotdl file left in place because some of its tracks weren't organized."""
+        print(f"⚠ Keeping .spotdl file {name}: not all of its tracks were organized")
+
+    def plan_file(self, source: SourceFile, metadata: Tuple[str, str]) -> PlannedMove:
+        """
+        Decides where a music file goes without touching the filesystem.
+
+        The destination and any planned-but-not-yet-applied moves are both
+        taken into account, so a plan resolves duplicates and name clashes
+        between files that haven't been moved yet.
+
+        Args:
+            source: The scanned music file
+            metadata: Its (artist, album)
+
+        Returns:
+            A 'move' or 'duplicate' step
+        """
+        artist, album = metadata
+        file_path = Path(source.path)
+        album_path = self.destination_dir / artist / album
+        destination_file = album_path / source.name
+
+        # The Bloom filter rules out most names and contents without going to
+        # disk, in albums that haven't changed since it was built
+        size_key = None
+        maybe_name = maybe_content = True
+        use_bloom = self.bloom is not None and self.bloom.covers(album_path)
+        if self.bloom is not None and self.detector is not None:
+            size_key = self.detector.size_key(file_path)
+        if use_bloom:
+            relative_album = os.path.join(artist, album)
+            maybe_name = self.bloom.might_have_path(os.path.join(relative_album, source.name))
+            if size_key is not None:
+                maybe_content = self.bloom.might_have_content(relative_album, size_key)
+        name_taken = maybe_name and self.name_taken(destination_file)
+        if use_bloom and maybe_name and not name_taken:
+            self.bloom.false_hits += 1
+
+        # Check for duplicates
+        if self.detector is None:
+            duplicate = destination_file if name_taken else None
+        elif not maybe_content:
+            duplicate = None
+        elif self.catalog_dedup and self.catalog_covers(album_path, artist, album,
+                                                        listed=not use_bloom or maybe_name):
+            duplicate = self.detector.first_identical(
+                file_path, self.catalog_candidates(file_path, artist, album))
+            if duplicate is not None:
+                duplicate = self._planned_paths.get(duplicate, duplicate)
+        else:
+            duplicate = self.detector.find_duplicate(file_path, album_path)
+            if duplicate is not None:
+                duplicate = self._planned_paths.get(duplicate, duplicate)
+            elif use_bloom and not self.detector.has_candidates(file_path, album_path):
+                self.bloom.false_hits += 1
+
+        if duplicate is not None:
+            return PlannedMove('duplicate', source.path, str(duplicate), artist, album,
+                               source.stat.st_size, source.stat.st_mtime_ns)
+
+        # Different content under the same name: keep both
+        if name_taken:
+            destination_file = self.unique_destination(destination_file)
+        self._reserved_names.setdefault(album_path, set()).add(destination_file.name)
+
+        if self.detector is not None:
+            self.register_planned(file_path, destination_file)
+        if self.bloom is not None:
+            self.bloom.add_file(os.path.join(artist, album, destination_file.name), size_key)
+
+        return PlannedMove('move', source.path, str(destination_file), artist, album,
+                           source.stat.st_size, source.stat.st_mtime_ns)
+
+    @property
+    def catalog_dedup(self) -> bool:
+        """Whether duplicate checks query the catalog instead of album directories."""
+        return (self.catalog is not None and self.catalog.complete
+                and self.detector is not None and self.catalog_hasher is self.detector)
+
+    def catalog_covers(self, album_path: Path, artist: str, album: str,
+                       listed: bool = True) -> bool:
+        """
+        Checks an album folder against the catalog before trusting it, once per folder.
+
+        Runs without --catalog, or other programs, may have added files the
+        catalog doesn't know. A listed music file without a catalog row marks
+        the catalog incomplete, and duplicate checks go back to the disk.
+
+        Args:
+            listed: Whether the folder may be listed; with a Bloom filter that
+                    rules the name out, the folder isn't read just for this
+        """
+        if album_path in self._catalog_checked or not listed:
+            return True
+        self._catalog_checked.add(album_path)
+
+        catalogued = self.catalog.album_names(artist, album)
+        unknown = [name for name, is_dir in self.index.listing(album_path).items()
+                   if not is_dir and self.is_music_name(name) and name not in catalogued]
+        if not unknown:
+            return True
+
+        print(f"⚠ {artist}/{album}/{unknown[0]} isn't in the catalog; "
+              f"checking duplicates on disk until it is rebuilt")
+        self.catalog.set_complete(False)
+        # Moves planned so far now have to be found by the detector
+        for (directory, _), paths in self._planned_hashes.items():
+            for path in paths:
+                if path in self._planned_paths:
+                    self.detector.add(path, directory)
+        self._planned_hashes.clear()
+        return False
+
+    def catalog_candidates(self, file_path: Path, artist: str, album: str) -> List[Path]:
+        """
+        Catalogued and planned files of an album with the same partial hash as file_path.
+
+        Returns:
+            Paths to compare in full; planned files by their source path
+        """
+        album_path = self.destination_dir / artist / album
+        digest = self.detector.partial_hash(file_path)
+        candidates = [self.destination_dir / path
+                      for path in self.catalog.find(artist, album, digest)]
+        # Applied or failed planned moves have left _planned_paths
+        candidates.extend(path for path in self._planned_hashes.get((album_path, digest), ())
+                          if path in self._planned_paths)
+        return candidates
+
+    def register_planned(self, file_path: Path, destination_file: Path) -> None:
+        """Makes a planned move visible to duplicate checks of later files."""
+        if self.catalog_dedup:
+            key = (destination_file.parent, self.detector.partial_hash(file_path))
+            self._planned_hashes.setdefault(key, []).append(file_path)
+        else:
+            self.detector.add(file_path, destination_file.parent)
+        self._planned_paths[file_path] = destination_file
+
+    def catalog_file(self, destination_file: Path, artist: str, album: str) -> None:
+        """Records a file that was just organized in the catalog, if enabled."""
+        if self.catalog is None:
+            return
+
+        try:
+            st = destination_file.stat()
+            digest = self.catalog_hasher.partial_hash(destination_file)
+            duration, bitrate = self.read_audio_info(destination_file)
+            self.catalog.add(os.path.join(artist, album, destination_file.name),
+                             st.st_size, st.st_mtime_ns, digest, artist, album,
+                             destination_file.suffix.lower().lstrip('.'), duration, bitrate)
+        except (OSError, sqlite3.Error) as e:
+            print(f"⚠ Couldn't catalog {destination_file.name}: {e}")
+
+    def apply_move(self, move: PlannedMove, verify: bool = False,
+                   op_id: Optional[int] = None, existing: Optional[Dict[str, bool]] = None,
+                   deferred: bool = False) -> bool:
+        """
+        Executes one planned step.
+
+        Args:
+            move: The step to execute
+            verify: Check that the source is unchanged since it was planned
+            op_id: Journal operation id; a copied source is then left for
+                   commit_copies() to remove once the copy is durable
+            existing: Index listing of the (already created) target directory
+            deferred: Let the copy scheduler run a cross-device copy; the
+                      caller drains it, and errors are reported then
+
+        Returns:
+            True if successfully applied, False otherwise
+        """
+        file_path = Path(move.source)
+
+        if self.link_mode is not None and move.action == 'delete':
+            return True  # Sources are left alone
+        if move.action == 'delete':
+            if self.spotdl_metadata and os.path.dirname(move.source) in self._failed_dirs:
+                self.keep_sidecar(file_path.name)
+                return True
+            return self.handle_spotdl_file(file_path)
+        if move.action == 'rename_dir':
+            if self.link_mode is not None:
+                organized = self._apply_directory_files(move)
+                if op_id is not None:
+                    self.journal.record(op_id, 'removed')
+                return organized
+            return self.apply_directory_rename(move, op_id)
+
+        created = False  # Whether this step put a file at the destination
+        try:
+            if verify:
+                st = file_path.stat()
+                if (st.st_size, st.st_mtime_ns) != (move.size, move.mtime_ns):
+                    raise RuntimeError("file changed since the plan was made")
+
+            if move.action == 'duplicate':
+                if not self.index.exists(Path(move.destination)):
+                    raise RuntimeError(f"duplicate target is missing: {move.destination}")
+                if self.link_mode is not None:
+                    if op_id is not None:
+                        self.journal.record(op_id, 'removed')
+                    print(f"⚠ Duplicate skipped: {file_path.name} "
+                          f"(same as {move.artist}/{move.album}/{os.path.basename(move.destination)})")
+                    self.stats['duplicates'] += 1
+                    return True
+                file_path.unlink()  # Remove source file
+                self._touched_dirs.add(file_path.parent)
+                if op_id is not None:
+                    self.journal.record(op_id, 'removed')
+                print(f"⚠ Duplicate removed: {file_path.name} "
+                      f"(same as {move.artist}/{move.album}/{os.path.basename(move.destination)})")
+                self.stats['duplicates'] += 1
+                return True
+
+            destination_file = Path(move.destination)
+            if existing is None:
+                existing = self._prepare_directory(destination_file.parent)
+            if destination_file.name in existing:
+                raise FileExistsError(f"destination already exists: {destination_file}")
+
+            if self.link_mode is not None:
+                self.link_file(file_path, destination_file)
+                created = True
+                self._finish_move(move, op_id, existing, None)
+                return True
+
+            # Cross-device copies go to the scheduler; renames happen right away
+            if (deferred and self.copies is not None
+                    and not self.same_device(file_path.parent, destination_file.parent)):
+                existing[destination_file.name] = False
+                self.copies.submit(file_path, destination_file, self.copy_file,
+                                   lambda result, error: self._finish_copy(move, op_id, existing,
+                                                                           result, error))
+                return True
+
+            # Move file to new location
+            copied = self.move_file(file_path, destination_file, keep_source=op_id is not None)
+            created = True
+            self._finish_move(move, op_id, existing, copied)
+            return True
+
+        except Exception as e:
+            self._move_failed(move, e, op_id, created)
+            return False
+
+    def _finish_move(self, move: PlannedMove, op_id: Optional[int],
+                     existing: Dict[str, bool], copied: Optional[CopyResult]) -> None:
+        """Records a file that is now in place at its destination, and how it got there."""
+        file_path = Path(move.source)
+        destination_file = Path(move.destination)
+        if op_id is not None:
+            if copied:
+                self._uncommitted_copies.append((op_id, file_path, destination_file))
+            else:
+                self.journal.record(op_id, 'removed')
+        self._touched_dirs.add(file_path.parent)
+        existing[destination_file.name] = False
+        if self.detector is not None:
+            self.detector.replace(file_path, destination_file)
+            self._planned_paths.pop(file_path, None)
+        self.catalog_file(destination_file, move.artist, move.album)
+
+        if copied:
+            print(f"✓ Organized: {file_path.name} → {move.artist}/{move.album}/ "
+                  f"({copied.strategy} copy, {copied.rate:.1f} MiB/s)")
+        else:
+            print(f"✓ Organized: {file_path.name} → {move.artist}/{move.album}/")
+        self.stats['processed'] += 1
+
+    def _finish_copy(self, move: PlannedMove, op_id: Optional[int], existing: Dict[str, bool],
+                     result: Optional[CopyResult], error: Optional[Exception]) -> None:
+        """CopyScheduler callback: finishes a move once its copy is done."""
+        if error is not None:
+            existing.pop(os.path.basename(move.destination), None)
+            self._move_failed(move, error, op_id)
+            return
+        try:
+            if op_id is None:
+                Path(move.source).unlink()  # Remove source after successful copy
+            self.record_copy(result)
+            self._finish_move(move, op_id, existing, result)
+        except Exception as e:
+            self._move_failed(move, e, op_id, created=True)
+
+    def _move_failed(self, move: PlannedMove, error: Exception,
+                     op_id: Optional[int] = None, created: bool = False) -> None:
+        """
+        Reports a step that couldn't be applied, and undoes what it did.
+
+        Args:
+            op_id: Journal operation id, closed as 'rolled_back'
+            created: The step itself put a file at its destination, which is
+                     then removed as long as the source is still there. Steps
+                     that fail part-way clean up after themselves, and a
+                     destination that already existed is never touched.
+        """
+        file_path = Path(move.source)
+        print(f"✗ Error processing {file_path.name}: {error}")
+        self.stats['errors'] += 1
+        if created and move.action == 'move' and file_path.exists():
+            destination_file = Path(move.destination)
+            try:
+                if os.path.lexists(destination_file):
+                    destination_file.unlink()
+                self.index.discard(destination_file)
+            except OSError as e:
+                print(f"⚠ Couldn't remove partial copy {destination_file}: {e}")
+        if op_id is not None:
+            self.journal.record(op_id, 'rolled_back')
+        self.source_failed(move.source)
+        if move.action == 'move' and self.detector is not None:
+            self.detector.discard(file_path, Path(move.destination).parent)
+            self._planned_paths.pop(file_path, None)
+
+    def apply_directory_rename(self, move: PlannedMove, op_id: Optional[int] = None) -> bool:
+        """
+        Renames a whole source folder into place as an album folder.
+
+        Its .spotdl sidecars are deleted first, or with spotdl_metadata once
+        the folder is in place. If the folder changed since it was planned,
+        or the rename fails, its files are moved one by one.
+
+        Returns:
+            True if every file was organized, False otherwise
+        """
+        source_dir = Path(move.source)
+        album_path = Path(move.destination)
+
+        try:
+            listing = os.listdir(source_dir)
+            music = sorted(name for name in listing if self.is_music_name(name))
+            sidecars = [name for name in listing if name.endswith('.spotdl')]
+            if len(music) != move.files or len(music) + len(sidecars) != len(listing):
+                raise RuntimeError("folder changed since it was planned")
+
+            if self.index.exists(album_path):
+                raise FileExistsError(f"destination already exists: {album_path}")
+            self._prepare_directory(album_path.parent)
+
+            if not self.spotdl_metadata:
+                for name in sidecars:
+                    self.handle_spotdl_file(source_dir / name)
+
+            os.rename(source_dir, album_path)
+        except Exception as e:
+            print(f"⚠ Moving {source_dir.name}/ file by file: {e}")
+            if op_id is not None:
+                self.journal.record(op_id, 'rolled_back')
+            organized = self._apply_directory_files(move)
+            if self.spotdl_metadata:
+                try:
+                    sidecars = [name for name in os.listdir(source_dir) if name.endswith('.spotdl')]
+                except OSError:
+                    sidecars = []
+                for name in sidecars:
+                    if organized:
+                        self.handle_spotdl_file(source_dir / name)
+                    else:
+                        self.keep_sidecar(name)
+            return organized
+
+        if self.spotdl_metadata:
+            for name in sidecars:
+                self.handle_spotdl_file(album_path / name)
+
+        if op_id is not None:
+            self.journal.record(op_id, 'removed')
+        self.index.add_directory(album_path, music)
+        self._touched_dirs.add(source_dir.parent)
+        if self.detector is not None:
+            for name in music:
+                self.detector.replace(source_dir / name, album_path / name)
+                self._planned_paths.pop(source_dir / name, None)
+        for name in music:
+            self.catalog_file(album_path / name, move.artist, move.album)
+
+        print(f"✓ Organized folder: {source_dir.name}/ → {move.artist}/{move.album}/ "
+              f"({len(music)} files)")
+        self.stats['processed'] += len(music)
+        self.stats['renamed'] += len(music)
+        return True
+
+    def _apply_directory_files(self, move: PlannedMove) -> bool:
+        """
+        Fallback for a failed folder rename: moves its music files individually.
+
+        The files go through apply_moves(), so each gets its own journal
+        intent, and cross-device copies the copy scheduler.
+        """
+        source_dir = Path(move.source)
+        album_path = Path(move.destination)
+        errors = self.stats['errors']
+
+        try:
+            names = sorted(name for name in os.listdir(source_dir) if self.is_music_name(name))
+        except OSError as e:
+            print(f"✗ Error processing folder {source_dir.name}: {e}")
+            self.stats['errors'] += 1
+            self.source_failed(os.path.join(str(source_dir), ''))
+            return False
+
+        file_moves = []
+        for name in names:
+            file_path = source_dir / name
+            try:
+                st = file_path.stat()
+            except OSError as e:
+                print(f"✗ Error processing {name}: {e}")
+                self.stats['errors'] += 1
+                self.source_failed(str(file_path))
+                continue
+            file_moves.append(PlannedMove('move', str(file_path), str(album_path / name),
+                                          move.artist, move.album, st.st_size, st.st_mtime_ns))
+        self.apply_moves(file_moves)
+        return self.stats['errors'] == errors
+
+    def unique_destination(self, destination_file: Path) -> Path:
+        """
+        Finds a free name next to destination_file, e.g. "Song (1).mp3".
+
+        Names reserved by planned moves count as taken.
+
+        Returns:
+            A path that doesn't exist yet
+        """
+        counter = 1
+        while True:
+            candidate = destination_file.with_name(
+                f"{destination_file.stem} ({counter}){destination_file.suffix}")
+            if not self.name_taken(candidate):
+                return candidate
+            counter += 1
+
+    def name_taken(self, destination_file: Path) -> bool:
+        """Whether a destination path exists (per the index) or is reserved by a planned move."""
+        return (self.index.exists(destination_file)
+                or destination_file.name in self._reserved_names.get(destination_file.parent, ()))
+
+    def prepare_bloom(self, save: bool = True) -> None:
+        """
+        Builds the Bloom filter on first use, or refreshes it on request.
+
+        Args:
+            save: Save the result; dry runs keep it in memory only
+        """
+        if self.bloom is None:
+            return
+        if self.bloom.built and not (self.bloom_refresh or self.bloom_rebuild):
+            return
+
+        full = self.bloom_rebuild or not self.bloom.built
+        print(f"🌸 {'Building' if full else 'Refreshing'} Bloom filter {self.bloom.bloom_path}...")
+        size_key = self.detector.size_key if self.detector is not None else None
+        added = self.bloom.refresh(self.destination_dir, size_key, full=full)
+        print(f"🌸 Bloom filter: {added} library files added")
+        if save:
+            self.save_bloom()
+
+    def save_bloom(self) -> None:
+        """Persists the Bloom filter, warning instead of failing."""
+        if self.bloom is None:
+            return
+        try:
+            self.bloom.save()
+        except OSError as e:
+            print(f"⚠ Couldn't save Bloom filter {self.bloom.bloom_path}: {e}")
+
+    def _bloom_add(self, file_path: Path, relative_path: str) -> None:
+        """Adds a library file to the Bloom filter, reading file_path for its size key."""
+        size_key = None
+        if self.detector is not None:
+            try:
+                size_key = self.detector.size_key(file_path)
+            except OSError:
+                pass
+        self.bloom.add_file(relative_path, size_key)
+
+    def link_file(self, source: Path, destination: Path) -> None:
+        """
+        Creates destination as a link_mode link to source, leaving source in place.
+
+        Hard links and reflinks need both paths on one filesystem (reflinks
+        also need btrfs, XFS or similar); symlinks point at the absolute
+        source path. An existing destination raises FileExistsError and is
+        left alone; a failed reflink removes the file it created.
+        """
+        if self.link_mode == 'hardlink':
+            os.link(source, destination)
+        elif self.link_mode == 'symlink':
+            os.symlink(os.path.abspath(source), destination)
+        else:
+            with open(source, 'rb') as fsrc:
+                fdst = open(destination, 'xb')
+                try:
+                    with fdst:
+                        _copy_reflink(fsrc, fdst)
+                    shutil.copystat(source, destination)
+                except BaseException as e:
+                    destination.unlink()
+                    if isinstance(e, _CopyUnsupported):
+                        raise OSError(errno.EOPNOTSUPP, "reflinks aren't supported here") from None
+                    raise
+        self.stats['linked'] += 1
+
+    def same_device(self, source_dir: Path, destination_dir: Path) -> bool:
+        """Whether two directories share a filesystem, checked once per pair."""
+        dir_pair = (source_dir, destination_dir)
+        same_device = self._same_device.get(dir_pair)
+        if same_device is None:
+            same_device = os.stat(source_dir).st_dev == os.stat(destination_dir).st_dev
+            self._same_device[dir_pair] = same_device
+        return same_device
+
+    def move_file(self, source: Path, destination: Path,
+                  keep_source: bool = False) -> Optional[CopyResult]:
+        """
+        Moves a file, renaming in place when both sides share a filesystem.
+
+        The device check is done once per (source dir, destination dir) pair.
+        Across devices the file is copied with copy_file and the source
+        unlinked; if either step fails, the copy is removed again so the file
+        is only ever in one place.
+
+        Args:
+            keep_source: After a copy, leave the source for the caller to remove
+
+        Returns:
+            How the file was copied, or None if it was renamed
+        """
+        if self.same_device(source.parent, destination.parent):
+            try:
+                os.rename(source, destination)
+                self.stats['renamed'] += 1
+                return None
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+                # Bind mounts can share st_dev but still refuse rename(2)
+                self._same_device[(source.parent, destination.parent)] = False
+
+        result = self.copy_file(source, destination)
+        if not keep_source:
+            try:
+                source.unlink()  # Remove source after successful copy
+            except OSError:
+                destination.unlink()
+                raise
+        self.record_copy(result)
+        return result
+
+    def copy_file(self, source: Path, destination: Path) -> CopyResult:
+        """copy_file() with this run's page cache setting; safe to call from copy threads."""
+        return copy_file(source, destination, self.drop_page_cache)
+
+    def record_copy(self, result: CopyResult) -> None:
+        """Counts a copy under the strategy copy_file() used for it."""
+        self.stats['copied'] += 1
+        totals = self.copy_totals.setdefault(result.strategy, [0, 0, 0.0])
+        totals[0] += 1
+        totals[1] += result.size
+        totals[2] += result.seconds
+
+    def cleanup_touched_directories(self) -> None:
+        """
+        Removes directories emptied since the last cleanup.
+
+        Only directories that files were moved or deleted from, and their
+        ancestors, are checked, so the cost scales with what changed rather
+        than with the size of the source tree. Nothing is removed in link mode.
+        """
+        touched, self._touched_dirs = self._touched_dirs, set()
+        if self.link_mode is not None:
+            return
+        self._cleanup_directories(touched)
+
+    def _cleanup_directories(self, directories) -> None:
+        """Removes the given directories and their ancestors if empty, deepest first."""
+        root = Path(os.path.abspath(self.source_dir))
+        candidates = set()
+        for dir_path in directories:
+            dir_path = Path(os.path.abspath(dir_path))
+            while dir_path != root and root in dir_path.parents:
+                if dir_path in candidates:
+                    break
+                candidates.add(dir_path)
+                dir_path = dir_path.parent
+
+        for dir_path in sorted(candidates, key=lambda path: len(path.parts), reverse=True):
+            try:
+                if not any(dir_path.iterdir()):  # Directory is empty
+                    dir_path.rmdir()
+                    print(f"✓ Removed empty directory: {dir_path}")
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"⚠ Couldn't remove directory {dir_path}: {e}")
+
+    def iter_source_files(self) -> Iterator[SourceFile]:
+        """
+        Scans the source tree with os.scandir for music and .spotdl files.
+
+        Extensions are matched on the raw entry name, and the DirEntry stat
+        result is carried along so later stages don't stat the file again.
+        In incremental mode, directories whose mtime is unchanged since the
+        last run are not listed (their recorded subdirectories are still
+        visited) and unchanged files are not yielded.
+
+        Yields:
+            SourceFile records of music and .spotdl files, in scan order
+        """
+        state = self.scan_state
+        root = str(self.source_dir)
+        stack = [root]
+
+        while stack:
+            dir_path = stack.pop()
+            previous_files = {}
+            record = None
+
+            if state is not None:
+                rel = os.path.relpath(dir_path, root)
+                try:
+                    mtime_ns = os.stat(dir_path).st_mtime_ns
+                except OSError:
+                    continue
+
+                previous = state.previous.get(rel)
+                if previous is not None and previous['mtime_ns'] == mtime_ns:
+                    state.dirs_skipped += 1
+                    state.files_skipped += len(previous['files'])
+                    state.current[rel] = previous
+                    stack.extend(os.path.join(dir_path, name)
+                                 for name in reversed(previous['subdirs']))
+                    continue
+
+                # Record the mtime from before listing, so anything that lands
+                # while we work makes the directory look changed next time
+                record = {'mtime_ns': mtime_ns, 'subdirs': [], 'files': {}}
+                state.current[rel] = record
+                if previous is not None:
+                    previous_files = previous['files']
+
+            try:
+                with os.scandir(dir_path) as it:
+                    entries = sorted(it, key=lambda entry: entry.name)
+            except OSError as e:
+                print(f"⚠ Couldn't scan {dir_path}: {e}")
+                continue
+
+            if self.spotdl_metadata:
+                self._sidecar_names[dir_path] = [entry.name for entry in entries
+                                                 if entry.name.endswith('.spotdl')]
+
+            subdirs = []
+            found = []
+            for entry in entries:
+                name = entry.name
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(name)
+                        continue
+
+                    wanted = self.is_music_name(name) or name.endswith('.spotdl')
+                    st = entry.stat() if wanted or record is not None else None
+                except OSError:
+                    continue
+
+                if record is not None:
+                    signature = [st.st_size, st.st_mtime_ns]
+                    record['files'][name] = signature
+                    if previous_files.get(name) == signature:
+                        state.files_skipped += 1
+                        continue
+
+                if wanted:
+                    found.append(SourceFile(entry.path, name, st))
+
+            if record is not None:
+                record['subdirs'] = subdirs
+            stack.extend(os.path.join(dir_path, name) for name in reversed(subdirs))
+            yield from found
+
+    def iter_with_metadata(self, files: Iterator[SourceFile]
+                           ) -> Iterator[Tuple[SourceFile, Optional[Tuple[str, str]]]]:
+        """
+        Pairs scanned files with their (artist, album); .spotdl files get None.
+
+        With workers > 1, files are grouped into batches of batch_size and the
+        cache misses of each batch are parsed by a process pool while earlier
+        batches are being planned and moved. Batches are consumed in
+        submission order, so the result is identical to a sequential run.
+        """
+        if self.workers <= 1:
+            for source in files:
+                if source.name.endswith('.spotdl'):
+                    yield source, None
+                else:
+                    yield source, self.extract_metadata(source.path, source.stat)
+            return
+
+        max_in_flight = self.workers * 2
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            in_flight = deque()
+
+            for batch in _batched(files, self.batch_size):
+                entries = [(source, None, None) if source.name.endswith('.spotdl')
+                           else (source, *self.known_metadata(source))
+                           for source in batch]
+                misses = [source.path for source, key, cached in entries
+                          if cached is None and not source.name.endswith('.spotdl')]
+                future = executor.submit(_read_metadata_batch, misses) if misses else None
+                in_flight.append((entries, future))
+
+                if len(in_flight) >= max_in_flight:
+                    yield from self._resolve_batch(*in_flight.popleft(), executor)
+
+            while in_flight:
+                yield from self._resolve_batch(*in_flight.popleft(), executor)
+
+    def known_metadata(self, source: SourceFile
+                       ) -> Tuple[Optional[tuple], Optional[Tuple[str, str]]]:
+        """
+        Metadata available without opening the file: from a sidecar, or the cache.
+
+        Returns:
+            Tuple of (cache key, (artist, album)); either may be None
+        """
+        sidecar = self.lookup_spotdl_metadata(source.path)
+        if sidecar is not None:
+            return None, sidecar
+        return self.lookup_cached_metadata(source.path, source.stat)
+
+    def _resolve_batch(self, entries: list, future, executor) -> list:
+        """Collects one batch's metadata once the pool has parsed it, in scan order."""
+        parsed = iter(future.result() if future is not None else ())
+        resolved = []
+
+        for source, key, cached in entries:
+            if source.name.endswith('.spotdl'):
+                resolved.append((source, None))
+                continue
+            if cached is None:
+                cached = next(parsed)
+                self.store_cached_metadata(source.path, key, *cached)
+            resolved.append((source, cached))
+
+        # Hash colliding candidates in the pool before planning needs them
+        if self.detector is not None and not self.catalog_dedup:
+            for source, metadata in resolved:
+                if metadata is not None:
+                    self.detector.known_stat(Path(source.path), source.stat)
+            self.detector.prefetch(
+                [(Path(source.path), self.destination_dir / metadata[0] / metadata[1])
+                 for source, metadata in resolved if metadata is not None],
+                executor)
+
+        return resolved
+
+    def plan(self, files: Iterator[SourceFile]) -> Iterator[PlannedMove]:
+        """
+        Planning phase: turns scanned files into PlannedMove steps, lazily.
 
-        # Statistics
-        self.stats = {
-            'processed': 0,
-            'duplicates': 0,
-            'spotdl_deleted': 0,
-            'errors': 0
-        }
+        Nothing is moved or deleted; steps can be applied one by one as they
+        are produced, or written out with write_plan() and applied later.
+        Files are planned a source directory at a time, so a folder that maps
+        cleanly onto one new album becomes a single 'rename_dir' step.
+        """
+        by_directory = itertools.groupby(self.iter_with_metadata(files),
+                                         key=lambda item: os.path.dirname(item[0].path))
 
-    @staticmethod
-    def sanitize_filename(name: str) -> str:
+        for directory, group in by_directory:
+            yield from self.plan_directory(directory, list(group))
+
+    def plan_directory(self, directory: str,
+                       group: List[Tuple[SourceFile, Optional[Tuple[str, str]]]]
+                       ) -> Iterator[PlannedMove]:
+        """Plans the files of one source directory, paired with their metadata."""
+        if self.spotdl_metadata:
+            # Sidecars are only deleted after the tracks they describe
+            group.sort(key=lambda item: item[1] is None)
+        if self.detector is not None:
+            for source, metadata in group:
+                if metadata is not None:
+                    self.detector.known_stat(Path(source.path), source.stat)
+        rename = self.plan_directory_rename(directory, group)
+        if rename is not None:
+            yield rename
+            return
+
+        for source, metadata in group:
+            if metadata is None:
+                yield PlannedMove('delete', source.path)
+                continue
+
+            try:
+                yield self.plan_file(source, metadata)
+            except Exception as e:
+                print(f"✗ Error processing {source.name}: {e}")
+                self.stats['errors'] += 1
+                self.source_failed(source.path)
+
+    def plan_directory_rename(self, directory: str,
+                              group: List[Tuple[SourceFile, Optional[Tuple[str, str]]]]
+                              ) -> Optional[PlannedMove]:
         """
-        Sanitizes a string to be used as a directory name.
+        Plans renaming a whole source folder into place as an album folder.
 
-        Args:
-            name: The string to sanitize
+        This applies when every music file in the folder resolves to the same
+        artist/album, that album folder doesn't exist and isn't planned, the
+        folder holds nothing but those files and .spotdl sidecars (which are
+        dropped), and it is on the destination's filesystem.
 
         Returns:
-            Sanitized string safe for use as directory name
+            A 'rename_dir' step, or None to plan the files one by one
         """
-        if not name or not name.strip():
-            return "Unknown"
+        music = [(source, metadata) for source, metadata in group if metadata is not None]
+        if not music or os.path.abspath(directory) == os.path.abspath(self.source_dir):
+            return None
+        if self.link_mode is not None:
+            return None  # The source folder has to stay
 
-        # Remove invalid characters for cross-platform compatibility
-        invalid_chars_pattern = r'[<>:"/\\|?*]'
-        sanitized = re.sub(invalid_chars_pattern, '_', name)
+        albums = {metadata for _, metadata in music}
+        if len(albums) != 1:
+            return None
+        artist, album = albums.pop()
+        album_path = self.destination_dir / artist / album
+        if self._reserved_names.get(album_path) or self.index.exists(album_path):
+            return None
 
-        # Remove leading/trailing whitespace and dots (Windows compatibility)
-        sanitized = sanitized.strip(' .')
+        # Same-size files could be duplicates of each other; check them one by one
+        sizes = {source.stat.st_size for source, _ in music}
+        if len(sizes) != len(music):
+            return None
 
-        # Truncate if too long (common filesystem limit)
-        if len(sanitized) > 200:
-            sanitized = sanitized[:200].rstrip()
+        names = {source.name for source, _ in music}
+        try:
+            for name in os.listdir(directory):
+                if name not in names and not name.endswith('.spotdl'):
+                    return None
+            if os.stat(directory).st_dev != _device_of(self.destination_dir):
+                return None
+        except OSError:
+            return None
 
-        return sanitized or "Unknown"
+        # Reserve the album for files planned after this folder
+        self._reserved_names.setdefault(album_path, set()).update(names)
+        if self.detector is not None:
+            for source, _ in music:
+                self.register_planned(Path(source.path), album_path / source.name)
+        if self.bloom is not None:
+            for source, _ in music:
+                self._bloom_add(Path(source.path), os.path.join(artist, album, source.name))
+
+        return PlannedMove('rename_dir', directory, str(album_path), artist, album,
+                           files=len(music))
+
+    def organize(self) -> None:
+        """Main organization method."""
+        # Validate directories
+        if not self.source_dir.exists():
+            print(f"✗ Source directory doesn't exist: {self.source_dir}")
+            return
+
+        # Create destination directory
+        self.destination_dir.mkdir(parents=True, exist_ok=True)
+
+        if not self.recover_journal():
+            return
+
+        print(f"🎵 Starting music organization...")
+        print(f"📁 Source: {self.source_dir}")
+        print(f"📁 Destination: {self.destination_dir}")
+        print("-" * 50)
+        self.prepare_bloom()
+
+        # Process all files
+        if self.pipeline:
+            self.organize_pipelined()
+        else:
+            self.organize_files(self.iter_source_files())
+        if self.copies is not None:
+            self.copies.shutdown()
+        if self.journal is not None:
+            self.journal.close()
+
+        # Cleanup directories emptied by this run
+        if self.link_mode is None:
+            print("\n🧹 Cleaning up empty directories...")
+            self.cleanup_touched_directories()
+
+        if self.cache is not None:
+            self.cache.close()
+        if self.catalog is not None:
+            self.catalog.close()
+        self.save_bloom()
 
-    def extract_metadata(self, file_path: Path) -> Tuple[str, str]:
+        if self.scan_state is not None:
+            try:
+                self.scan_state.save()
+            except OSError as e:
+                print(f"⚠ Couldn't save state file {self.scan_state.state_path}: {e}")
+
+        # Print summary
+        self.print_summary()
+
+    def organize_files(self, files: Iterator[SourceFile]) -> None:
+        """Plans scanned files and applies the steps in batches."""
+        for batch in _batched(self.plan(files), self.apply_batch_size):
+            self.apply_moves(batch)
+
+    def organize_pipelined(self) -> None:
+        """Runs organize()'s scan, tag-read, plan and move stages concurrently."""
+        asyncio.run(self._pipeline())
+
+    async def _pipeline(self) -> None:
         """
-        Extracts artist and album information from music file metadata.
+        Streaming organize: stages joined by bounded queues.
 
-        Args:
-            file_path: Path to the music file
+        The scanner walks the source in a thread of its own and tag readers
+        parse cache misses in a pool (processes with workers > 1, threads
+        otherwise), so disk and CPU work overlap. Planning and moving share
+        the destination state, so both run on one library thread; the queue
+        between them lets the next folder be planned while moves are pending.
+        Every queue holds at most queue_size items and at most four times
+        that are in flight between the scanner and the planner, including
+        files waiting to be put back in scan order, so memory stays flat.
+        """
+        loop = asyncio.get_running_loop()
+        scanned = asyncio.Queue(self.queue_size)
+        tagged = asyncio.Queue(self.queue_size)
+        planned = asyncio.Queue(self.queue_size)
+        window = asyncio.Semaphore(self.queue_size * 4)
+        readers = self.workers * 2
+        finished = object()
+
+        print(f"🚰 Pipeline: 1 scanner, {readers} tag readers, 1 planner, 1 mover "
+              f"(queues of {self.queue_size})")
+
+        scan_thread = ThreadPoolExecutor(1, thread_name_prefix='scan')
+        library_thread = ThreadPoolExecutor(1, thread_name_prefix='library')
+        if self.workers > 1:
+            tag_pool = ProcessPoolExecutor(max_workers=self.workers)
+        else:
+            tag_pool = ThreadPoolExecutor(readers, thread_name_prefix='tags')
+
+        async def scan():
+            batches = _batched(self.iter_source_files(), self.batch_size)
+            seq = 0
+            while True:
+                batch = await loop.run_in_executor(scan_thread, next, batches, finished)
+                if batch is finished:
+                    break
+                for source in batch:
+                    await window.acquire()
+                    await scanned.put((seq, source))
+                    seq += 1
+            for _ in range(readers):
+                await scanned.put(finished)
+
+        async def read_tags():
+            done = False
+            while not done:
+                batch = [await scanned.get()]
+                while batch[-1] is not finished and len(batch) < self.batch_size \
+                        and not scanned.empty():
+                    batch.append(scanned.get_nowait())
+                if batch[-1] is finished:
+                    done = True
+                    batch.pop()
+
+                entries = [(seq, source, None, None) if source.name.endswith('.spotdl')
+                           else (seq, source, *self.known_metadata(source))
+                           for seq, source in batch]
+                misses = [source.path for seq, source, key, cached in entries
+                          if cached is None and not source.name.endswith('.spotdl')]
+                parsed = iter(await loop.run_in_executor(tag_pool, _read_metadata_batch, misses)
+                              if misses else ())
+
+                for seq, source, key, cached in entries:
+                    if cached is None and not source.name.endswith('.spotdl'):
+                        cached = next(parsed)
+                        self.store_cached_metadata(source.path, key, *cached)
+                    await tagged.put((seq, source, cached))
+            await tagged.put(finished)
+
+        async def plan_directory(directory, group):
+            moves = await loop.run_in_executor(
+                library_thread, lambda: list(self.plan_directory(directory, group)))
+            for move in moves:
+                await planned.put(move)
+
+        async def plan():
+            # Tag readers finish out of order; folders are planned in scan order
+            pending = {}
+            next_seq = 0
+            directory, group = None, []
+            running = readers
+            while running:
+                item = await tagged.get()
+                if item is finished:
+                    running -= 1
+                    continue
+                pending[item[0]] = item[1:]
+                while next_seq in pending:
+                    source, metadata = pending.pop(next_seq)
+                    next_seq += 1
+                    window.release()
+                    source_dir = os.path.dirname(source.path)
+                    if group and source_dir != directory:
+                        await plan_directory(directory, group)
+                        group = []
+                    directory = source_dir
+                    group.append((source, metadata))
+            if group:
+                await plan_directory(directory, group)
+            await planned.put(finished)
+
+        async def move():
+            done = False
+            while not done:
+                batch = [await planned.get()]
+                while batch[-1] is not finished and len(batch) < self.apply_batch_size \
+                        and not planned.empty():
+                    batch.append(planned.get_nowait())
+                if batch[-1] is finished:
+                    done = True
+                    batch.pop()
+                if batch:
+                    await loop.run_in_executor(library_thread, self.apply_moves, batch)
+
+        stages = [asyncio.ensure_future(stage)
+                  for stage in [scan(), plan(), move()] + [read_tags() for _ in range(readers)]]
+        try:
+            await asyncio.gather(*stages)
+        except BaseException:
+            for stage in stages:
+                stage.cancel()
+            await asyncio.gather(*stages, return_exceptions=True)
+            raise
+        finally:
+            for executor in (scan_thread, tag_pool, library_thread):
+                executor.shutdown(wait=True)
+
+    def apply_moves(self, moves: List[PlannedMove], verify: bool = False) -> None:
+        """
+        Applies a batch of steps one target directory at a time.
+
+        Steps are grouped by target directory in first-seen order, with
+        .spotdl deletions last. Each directory is created at most once and
+        collisions are checked against its index listing.
+
+        With a copy scheduler, cross-device copies run concurrently per
+        device pair and the batch waits for them before its deletions.
+        Under the journal, all intents are made durable with one fsync before
+        any file is touched, and copied sources are only removed by
+        commit_copies() after the copies and the journal have been synced.
+        """
+        op_ids: Dict[int, int] = {}
+        if self.journal is not None:
+            for index, move in enumerate(moves):
+                if move.action != 'delete':
+                    op_ids[index] = self.journal.intent(
+                        move, existed=self.index.exists(Path(move.destination)))
+            self.journal.sync()
+
+        groups: Dict[str, List[int]] = {}
+        deletions = []
+        for index, move in enumerate(moves):
+            if move.action == 'delete':
+                deletions.append(index)
+            else:
+                groups.setdefault(os.path.dirname(move.destination), []).append(index)
+
+        for directory, indexes in groups.items():
+            try:
+                existing = self._prepare_directory(Path(directory))
+            except OSError:
+                existing = None  # Reported per file by apply_move
+            for index in indexes:
+                self.apply_move(moves[index], verify, op_ids.get(index), existing, deferred=True)
+        if self.copies is not None:
+            self.copies.drain()
+
+        for index in deletions:
+            self.apply_move(moves[index])
+
+        if self.journal is not None:
+            self.commit_copies()
+
+    def _prepare_directory(self, directory: Path) -> Dict[str, bool]:
+        """
+        Creates a target directory unless the index already knows it.
 
         Returns:
-            Tuple of (artist, album)
+            The directory's live index listing
         """
-        try:
-            audio = File(str(file_path), easy=True)
+        if not self.index.is_dir(directory):
+            directory.mkdir(parents=True, exist_ok=True)
+            self.index.add_directory(directory)
+        return self.index.listing(directory)
 
-            if audio is None:
-                return "Unknown Artist", "Unknown Album"
+    def commit_copies(self) -> None:
+        """Makes pending copies durable, then removes their sources."""
+        if not self._uncommitted_copies:
+            return
 
-            # Prioritize albumartist over artist for better compilation handling
-            artist = ""
-            if 'albumartist' in audio and audio['albumartist'][0]:
-                artist = str(audio['albumartist'][0])
-            elif 'artist' in audio and audio['artist'][0]:
-                artist = str(audio['artist'][0])
+        copies, self._uncommitted_copies = self._uncommitted_copies, []
+        synced_dirs = set()
+        committed = []
 
-            album = ""
-            if 'album' in audio and audio['album'][0]:
-                album = str(audio['album'][0])
+        for op_id, source, destination in copies:
+            try:
+                _fsync_path(destination)
+                if destination.parent not in synced_dirs:
+                    _fsync_path(destination.parent, directory=True)
+                    synced_dirs.add(destination.parent)
+                self.journal.record(op_id, 'copied')
+                committed.append((op_id, source))
+            except OSError as e:
+                print(f"✗ Couldn't sync {destination}: {e}")
+                self.stats['errors'] += 1
 
-            # Sanitize the extracted metadata
-            artist = self.sanitize_filename(artist) or "Unknown Artist"
-            album = self.sanitize_filename(album) or "Unknown Album"
+        self.journal.sync()
 
-            return artist, album
+        for op_id, source in committed:
+            try:
+                source.unlink()  # Remove source after durable copy
+                self.journal.record(op_id, 'removed')
+            except OSError as e:
+                print(f"✗ Couldn't remove {source.name} after copying: {e}")
+                self.stats['errors'] += 1
 
-        except Exception as e:
-            print(f"Warning: Couldn't read metadata for {file_path.name}: {e}")
-            return "Unknown Artist", "Unknown Album"
+    def resume(self) -> None:
+        """
+        Finishes or rolls back operations left incomplete by a crash.
 
-    def is_music_file(self, file_path: Path) -> bool:
-        """Check if file is a supported music format."""
-        return file_path.suffix.lower() in self.music_extensions
+        A durable copy just has its source removed. An operation with only an
+        intent is rolled back if the source is still there (a possibly
+        truncated destination is deleted, but only if the operation created
+        it) and then applied again; if only the destination exists, the
+        operation had already finished.
+        """
+        incomplete = self.journal.incomplete()
+        print(f"♻️  Resuming {len(incomplete)} incomplete operation(s) from {self.journal.journal_path}")
 
-    def handle_spotdl_file(self, file_path: Path) -> bool:
+        for entry in incomplete:
+            source = Path(entry['source'])
+            destination = Path(entry['destination'])
+            op_id = entry['id']
+
+            if not source.exists():
+                if entry['action'] == 'duplicate' or destination.exists():
+                    self.journal.record(op_id, 'removed')
+                else:
+                    print(f"✗ Lost track of {source.name}: neither source nor destination exists")
+                    self.stats['errors'] += 1
+                continue
+
+            if entry.get('state') == 'copied':
+                source.unlink()
+                self._touched_dirs.add(source.parent)
+                self.journal.record(op_id, 'removed')
+                print(f"✓ Finished move: {source.name} → {entry['artist']}/{entry['album']}/")
+                continue
+
+            # Roll back a partial copy, then replay the step
+            if (entry['action'] == 'move' and not entry['existed']
+                    and os.path.lexists(destination)):
+                destination.unlink()
+                self.index.discard(destination)
+                print(f"↩️  Rolled back partial copy: {destination}")
+
+            self.journal.record(op_id, 'rolled_back')
+            move = PlannedMove(**{field: entry[field] for field in PlannedMove._fields
+                                  if field in entry})
+            self.apply_moves([move], verify=True)
+
+        self.journal.sync()
+
+    def dry_run(self, plan_path: Optional[str] = None) -> None:
         """
-        Handles .spotdl files by deleting them.
+        Plans the whole run without changing anything.
+
+        Args:
+            plan_path: Write the plan here as JSON Lines; otherwise print it
+        """
+        if not self.source_dir.exists():
+            print(f"✗ Source directory doesn't exist: {self.source_dir}")
+            return
+
+        print("🔍 DRY RUN MODE - No files will be moved or deleted")
+        print(f"📁 Source: {self.source_dir}")
+        print(f"📁 Destination: {self.destination_dir}")
+        print("-" * 50)
+        # The filter is only built in memory; nothing is written
+        self.prepare_bloom(save=False)
+
+        counts = {'move': 0, 'duplicate': 0, 'delete': 0}
+        folder_files = 0
+        steps = self.plan(self.iter_source_files())
+
+        if plan_path:
+            for move in write_plan(steps, plan_path):
+                if move.action == 'rename_dir':
+                    folder_files += move.files
+                else:
+                    counts[move.action] += 1
+            print(f"📝 Plan written to {plan_path}")
+        else:
+            for move in steps:
+                name = os.path.basename(move.source)
+                if move.action == 'rename_dir':
+                    folder_files += move.files
+                    print(f"→ Would organize folder: {name}/ → {move.artist}/{move.album}/ "
+                          f"({move.files} files)")
+                    continue
+
+                counts[move.action] += 1
+                if move.action == 'move':
+                    print(f"→ Would organize: {name} → {move.artist}/{move.album}/"
+                          f"{os.path.basename(move.destination)}")
+                elif move.action == 'duplicate':
+                    print(f"→ Would remove duplicate: {name} "
+                          f"(same as {move.artist}/{move.album}/{os.path.basename(move.destination)})")
+                else:
+                    print(f"→ Would delete .spotdl file: {name}")
+
+        if self.cache is not None:
+            self.cache.close()
+        if self.catalog is not None:
+            self.catalog.close()
+
+        print("\n" + "=" * 50)
+        print(f"✅ Files to organize: {counts['move'] + folder_files}")
+        print(f"🔄 Duplicates to remove: {counts['duplicate']}")
+        print(f"🗑️  .spotdl files to delete: {counts['delete']}")
+        print(f"❌ Errors encountered: {self.stats['errors']}")
+
+    @staticmethod
+    def _already_applied(move: PlannedMove) -> bool:
+        """True if the source is gone and the step's outcome is already in place."""
+        if os.path.exists(move.source):
+            return False
+        return move.action == 'delete' or os.path.exists(move.destination)
+
+    def recover_journal(self) -> bool:
+        """
+        Checks the journal for operations left over from a crashed run.
 
         Returns:
-            True if successfully deleted, False otherwise
+            True if it is safe to continue
         """
-        try:
-            file_path.unlink()
-            print(f"✓ Deleted .spotdl file: {file_path.name}")
-            self.stats['spotdl_deleted'] += 1
+        if self.journal is None or not self.journal.incomplete():
             return True
-        except Exception as e:
-            print(f"✗ Error deleting .spotdl file {file_path.name}: {e}")
-            self.stats['errors'] += 1
+
+        if not self.resume_journal:
+            print(f"✗ {self.journal.journal_path} lists {len(self.journal.incomplete())} "
+                  f"unfinished operation(s) from an interrupted run. Re-run with --resume.")
             return False
 
-    def organize_file(self, file_path: Path) -> bool:
+        self.resume()
+        return True
+
+    def apply_plan(self, plan_path: str) -> None:
         """
-        Organizes a single music file.
+        Apply phase for a plan written by dry_run(), without re-reading tags.
 
-        Returns:
-            True if successfully organized, False otherwise
+        Steps whose source changed since planning are skipped as errors.
         """
-        try:
-            # Extract metadata
-            artist, album = self.extract_metadata(file_path)
+        if not self.recover_journal():
+            return
 
-            # Create destination path
-            artist_path = self.destination_dir / artist
-            album_path = artist_path / album
-            destination_file = album_path / file_path.name
+        print(f"🎵 Applying plan {plan_path}...")
+        print("-" * 50)
 
-            # Check for duplicates
-            if destination_file.exists():
-                file_path.unlink()  # Remove source file
-                print(f"⚠ Duplicate removed: {file_path.name} (exists in {artist}/{album}/)")
-                self.stats['duplicates'] += 1
-                return True
+        # Steps finished by an earlier, interrupted run are skipped
+        steps = (move for move in read_plan(plan_path) if not self._already_applied(move))
 
-            # Create directory structure
-            album_path.mkdir(parents=True, exist_ok=True)
+        for batch in _batched(steps, self.apply_batch_size):
+            self.apply_moves(batch, verify=True)
+            if self.bloom is not None:
+                self._bloom_add_applied(batch)
+        if self.copies is not None:
+            self.copies.shutdown()
+        if self.journal is not None:
+            self.journal.close()
+        if self.catalog is not None:
+            self.catalog.close()
+        self.save_bloom()
 
-            # Copy file to new location
-            shutil.copy2(file_path, destination_file)
-            file_path.unlink()  # Remove source after successful copy
+        if self.link_mode is None:
+            print("\n🧹 Cleaning up empty directories...")
+            self.cleanup_touched_directories()
+        self.print_summary()
 
-            print(f"✓ Organized: {file_path.name} → {artist}/{album}/")
-            self.stats['processed'] += 1
-            return True
+    def rebuild_catalog(self, walkers: int = 8, hash_kind: str = 'content') -> None:
+        """
+        Rebuilds the catalog from every music file in the destination library.
 
-        except Exception as e:
-            print(f"✗ Error processing {file_path.name}: {e}")
-            self.stats['errors'] += 1
-            return False
+        Directories are listed by a pool of walker threads. Files are hashed
+        and their stream info read in the process pool (in-process with one
+        worker), in batches of batch_size; their artist/album come from the
+        Artist/Album folders they sit in, or from their tags elsewhere. A
+        single writer thread owns the database and inserts rows in large
+        transactions. The catalog is marked complete once every row is in.
 
-    def cleanup_empty_directories(self) -> None:
-        """Remove empty directories from source path."""
-        try:
-            for root, dirs, files in os.walk(self.source_dir, topdown=False):
-                for dir_name in dirs:
-                    dir_path = Path(root) / dir_name
+        Args:
+            walkers: Threads listing directories concurrently
+            hash_kind: 'content' or 'audio', the duplicate check mode the
+                       hashes are for
+        """
+        if self.catalog is None:
+            print("✗ No catalog to rebuild")
+            return
+        if not self.destination_dir.is_dir():
+            print(f"✗ Library directory doesn't exist: {self.destination_dir}")
+            return
+
+        print(f"🗂️  Rebuilding catalog {self.catalog.db_path}...")
+        print(f"📁 Library: {self.destination_dir}")
+        print("-" * 50)
+
+        catalog = self.catalog
+        catalog.clear(hash_kind)
+        rows_queue = queue.Queue(maxsize=16)
+        writer_errors = []
+
+        def write_rows():
+            buffer = []
+            while True:
+                rows = rows_queue.get()
+                if rows is not None:
+                    buffer.extend(rows)
+                if buffer and (rows is None or len(buffer) >= 10000):
                     try:
-                        if not any(dir_path.iterdir()):  # Directory is empty
-                            dir_path.rmdir()
-                            print(f"✓ Removed empty directory: {dir_path}")
-                    except Exception as e:
-                        print(f"⚠ Couldn't remove directory {dir_path}: {e}")
-        except Exception as e:
-            print(f"Error during cleanup: {e}")
+                        if not writer_errors:
+                            catalog.add_many(buffer)
+                    except sqlite3.Error as e:
+                        writer_errors.append(e)  # Keep draining so producers never block
+                    buffer = []
+                if rows is None:
+                    return
 
-    def organize(self) -> None:
-        """Main organization method."""
-        # Validate directories
+        writer = threading.Thread(target=write_rows, name='catalog-writer')
+        writer.start()
+
+        root = str(self.destination_dir)
+        files = errors = total_bytes = 0
+        started = last_report = time.monotonic()
+
+        def collect(result: Tuple[List[tuple], int]) -> None:
+            nonlocal files, errors, total_bytes, last_report
+            rows, failed = result
+            rows_queue.put(rows)
+            files += len(rows)
+            errors += failed
+            total_bytes += sum(row[1] for row in rows)
+            now = time.monotonic()
+            if now - last_report >= 2.0:
+                last_report = now
+                print(f"🗂️  {files} files catalogued, {self._walked_dirs} directories walked "
+                      f"({files / (now - started):.0f} files/s)")
+
+        library_files = itertools.chain.from_iterable(self._walk_library(root, walkers))
+        jobs = ((root, hash_kind, batch) for batch in _batched(library_files, self.batch_size))
+
+        try:
+            if self.workers <= 1:
+                for job in jobs:
+                    collect(_catalog_batch(job))
+            else:
+                with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                    in_flight = deque()
+                    for job in jobs:
+                        in_flight.append(executor.submit(_catalog_batch, job))
+                        if len(in_flight) >= self.workers * 2:
+                            collect(in_flight.popleft().result())
+                    while in_flight:
+                        collect(in_flight.popleft().result())
+        finally:
+            rows_queue.put(None)
+            writer.join()
+
+        elapsed = max(time.monotonic() - started, 1e-9)
+        if writer_errors:
+            print(f"✗ Catalog writes failed, catalog left incomplete: {writer_errors[0]}")
+        else:
+            catalog.set_complete(True)
+        catalog.close()
+
+        print("\n" + "=" * 50)
+        print(f"✅ Files catalogued: {files} in {self._walked_dirs} directories")
+        print(f"❌ Unreadable files: {errors}")
+        print(f"⏱️  {elapsed:.1f}s: {files / elapsed:.0f} files/s, "
+              f"{total_bytes / elapsed / 1024 ** 2:.1f} MiB/s of library")
+
+    def _walk_library(self, root: str, walkers: int) -> Iterator[List[Tuple[str, int, int]]]:
+        """
+        Lists a directory tree with a pool of threads, in no particular order.
+
+        Files directly in root (cache, state, catalog) are left out. The number
+        of directories listed so far is kept in _walked_dirs.
+
+        Yields:
+            Per directory, (path, size, mtime_ns) of its music files
+        """
+        extensions = tuple(self.music_extensions)
+
+        with ThreadPoolExecutor(max_workers=max(1, walkers)) as pool:
+            pending = {pool.submit(_scan_library_directory, root, extensions)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    directory, music, subdirs = future.result()
+                    self._walked_dirs += 1
+                    pending.update(pool.submit(_scan_library_directory, subdir, extensions)
+                                   for subdir in subdirs)
+                    if music and directory != root:
+                        yield music
+
+    def _bloom_add_applied(self, moves: List[PlannedMove]) -> None:
+        """Adds the files placed by applied plan steps to the Bloom filter."""
+        for move in moves:
+            destination = Path(move.destination or '')
+            if move.action == 'move' and self.index.exists(destination):
+                names = [destination.name]
+                destination = destination.parent
+            elif move.action == 'rename_dir' and self.index.is_dir(destination):
+                names = list(self.index.listing(destination))
+            else:
+                continue
+            for name in names:
+                self._bloom_add(destination / name, os.path.join(move.artist, move.album, name))
+
+    def watch(self, debounce: float = 5.0, max_wait: float = 60.0) -> None:
+        """
+        Organizes files as they finish downloading, until interrupted.
+
+        Files reported by inotify (IN_CLOSE_WRITE / IN_MOVED_TO) are queued per
+        directory. A directory is flushed as one batch once it has been quiet
+        for debounce seconds, or after max_wait seconds of continuous activity.
+        Files whose size changed since they were queued are held back for
+        another debounce window, so half-written downloads are left alone.
+        """
         if not self.source_dir.exists():
             print(f"✗ Source directory doesn't exist: {self.source_dir}")
             return
 
-        # Create destination directory
         self.destination_dir.mkdir(parents=True, exist_ok=True)
+        watcher = InotifyWatcher()
 
-        print(f"🎵 Starting music organization...")
+        print("👀 Watching for new music...")
         print(f"📁 Source: {self.source_dir}")
         print(f"📁 Destination: {self.destination_dir}")
         print("-" * 50)
 
-        # Process all files
-        for root, _, files in os.walk(self.source_dir):
-            root_path = Path(root)
+        # Per directory: path -> size when last seen, plus activity timestamps
+        pending: Dict[Path, Dict[Path, int]] = {}
+        first_event: Dict[Path, float] = {}
+        last_event: Dict[Path, float] = {}
+
+        def enqueue(paths: List[Path]) -> None:
+            now = time.monotonic()
+            for path in paths:
+                try:
+                    size = path.stat().st_size
+                except OSError:
+                    continue
+                pending.setdefault(path.parent, {})[path] = size
+                first_event.setdefault(path.parent, now)
+                last_event[path.parent] = now
+
+        if not self.recover_journal():
+            watcher.close()
+            return
+        self.prepare_bloom()
 
-            for filename in files:
-                file_path = root_path / filename
+        try:
+            enqueue(watcher.add_tree(self.source_dir))
 
-                if filename.endswith('.spotdl'):
-                    self.handle_spotdl_file(file_path)
-                elif self.is_music_file(file_path):
-                    self.organize_file(file_path)
+            while True:
+                files, overflow = watcher.read_events(min(debounce, 1.0))
+                if overflow:
+                    print("⚠ inotify queue overflowed, rescanning source tree")
+                    enqueue([Path(root) / name
+                           for root, _, names in os.walk(self.source_dir) for name in names])
+                enqueue(files)
 
-        # Cleanup empty directories
-        print("\n🧹 Cleaning up empty directories...")
-        self.cleanup_empty_directories()
+                now = time.monotonic()
+                for directory in list(pending):
+                    quiet = now - last_event[directory] >= debounce
+                    overdue = now - first_event[directory] >= max_wait
+                    if quiet or overdue:
+                        self._flush_watched_directory(directory, pending, first_event, last_event)
+        finally:
+            watcher.close()
+            if self.journal is not None:
+                self.journal.close()
+            if self.cache is not None:
+                self.cache.close()
+            if self.catalog is not None:
+                self.catalog.close()
+            self.save_bloom()
+            self.print_summary()
 
-        # Print summary
-        self.print_summary()
+    def _flush_watched_directory(self, directory: Path, pending: dict,
+                                 first_event: dict, last_event: dict) -> None:
+        """Organizes the settled files of one watched directory as a batch."""
+        settled = []
+        still_writing = {}
+
+        for path, size in pending.pop(directory).items():
+            try:
+                st = path.stat()
+            except OSError:
+                continue  # Moved or deleted before we got to it
+            if st.st_size == size:
+                settled.append(SourceFile(str(path), path.name, st))
+            else:
+                still_writing[path] = st.st_size
+
+        del first_event[directory]
+        del last_event[directory]
+        if still_writing:
+            now = time.monotonic()
+            pending[directory] = still_writing
+            first_event[directory] = now
+            last_event[directory] = now
+
+        music_files = sorted(source for source in settled
+                             if self.is_music_name(source.name))
+        spotdl_files = [source for source in settled if source.name.endswith('.spotdl')]
+        if not music_files and not spotdl_files:
+            return
+
+        # The library may have changed since the last batch
+        self.index.clear()
+        self._reserved_names.clear()
+        self._catalog_checked.clear()
+        if self.detector is not None:
+            self.detector.reset()
+        if self.bloom is not None:
+            self.bloom.forget_covers()
+
+        # Sidecars go last, after the tracks they describe
+        self.organize_files(iter(music_files + spotdl_files))
+
+        self.cleanup_touched_directories()
+        if self.cache is not None:
+            self.cache.flush()
+        if self.catalog is not None:
+            self.catalog.flush()
+        self.save_bloom()
 
     def print_summary(self) -> None:
         """Print organization statistics."""
         print("\n" + "=" * 50)
         print("🎉 Organization Complete!")
         print("=" * 50)
-        print(f"✅ Files organized: {self.stats['processed']}")
-        print(f"🔄 Duplicates removed: {self.stats['duplicates']}")
-        print(f"🗑️  .spotdl files deleted: {self.stats['spotdl_deleted']}")
+        if self.link_mode is not None:
+            print(f"✅ Files organized: {self.stats['processed']} "
+                  f"({self.stats['linked']} {self.link_mode}s, sources kept)")
+            print(f"🔄 Duplicates skipped: {self.stats['duplicates']}")
+        else:
+            print(f"✅ Files organized: {self.stats['processed']} "
+                  f"({self.stats['renamed']} renamed, {self.stats['copied']} copied)")
+            print(f"🔄 Duplicates removed: {self.stats['duplicates']}")
+            print(f"🗑️  .spotdl files deleted: {self.stats['spotdl_deleted']}")
         print(f"❌ Errors encountered: {self.stats['errors']}")
 
-        total_processed = sum(self.stats.values()) - self.stats['errors']
+        if self.spotdl_metadata:
+            print(f"🎧 Tags taken from .spotdl files: {self.stats['spotdl_metadata']}")
+
+        if self.cache is not None:
+            lookups = self.cache.hits + self.cache.misses
+            hit_rate = (self.cache.hits / lookups * 100) if lookups else 0.0
+            print(f"💾 Metadata cache: {self.cache.hits} hits, {self.cache.misses} misses "
+                  f"({hit_rate:.1f}% hit rate)")
+
+        if self.scan_state is not None:
+            print(f"⏭️  Incremental scan: {self.scan_state.dirs_skipped} unchanged directories, "
+                  f"{self.scan_state.files_skipped} unchanged files skipped")
+
+        if self.detector is not None:
+            print(f"🔍 Duplicate checks: {self.detector.partial_hashes} partial hashes, "
+                  f"{self.detector.full_hashes} full hashes")
+        print(f"📇 Destination directories listed: {self.index.scans}")
+
+        for strategy, (files, size, seconds) in self.copy_totals.items():
+            rate = size / 1024 ** 2 / seconds if seconds > 0 else 0.0
+            print(f"📀 Copied by {strategy}: {files} files, {size / 1024 ** 2:.1f} MiB "
+                  f"({rate:.1f} MiB/s)")
+
+        if self.copies is not None:
+            for line in self.copies.report():
+                print(f"💽 Copies {line}")
+
+        if self.catalog is not None:
+            files, artists, albums, total = self.catalog.summary()
+            print(f"🗂️  Library catalog: {files} files, {artists} artists, {albums} albums "
+                  f"({total / 1024 ** 3:.1f} GiB)"
+                  + ("" if self.catalog.complete else "; incomplete, duplicate checks read the disk"))
+
+        if self.bloom is not None:
+            print(f"🌸 Bloom filter: {self.bloom.count} entries, "
+                  f"{self.bloom.false_positive_rate() * 100:.2f}% expected false-positive rate; "
+                  f"{self.bloom.hits}/{self.bloom.probes} probes hit, "
+                  f"{self.bloom.false_hits} of them false")
+            if self.bloom.stale_albums:
+                print(f"🌸 Albums changed since the Bloom filter was built: "
+                      f"{self.bloom.stale_albums} (checked on disk; --bloom-refresh adds them)")
+
+        total_processed = (self.stats['processed'] + self.stats['duplicates']
+                           + self.stats['spotdl_deleted'])
         if total_processed > 0:
             print(f"\n📊 Success rate: {((total_processed - self.stats['errors']) / total_processed * 100):.1f}%")
 
 
+def _batched(items: Iterator, size: int) -> Iterator[list]:
+    """Groups an iterator into lists of at most size items."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _device_of(path: Path) -> int:
+    """st_dev of path, or of its nearest existing ancestor."""
+    path = Path(os.path.abspath(path))
+    while not path.exists() and path != path.parent:
+        path = path.parent
+    return path.stat().st_dev
+
+
+def _fsync_path(path: Path, directory: bool = False) -> None:
+    """fsyncs a file, or a directory so that new entries in it are durable."""
+    fd = os.open(path, os.O_RDONLY | (getattr(os, 'O_DIRECTORY', 0) if directory else 0))
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_plan(steps: Iterator[PlannedMove], plan_path: str) -> Iterator[PlannedMove]:
+    """
+    Streams plan steps to a JSON Lines file with absolute paths.
+
+    Yields:
+        Each step after it has been written
+    """
+    with open(plan_path, 'w', encoding='utf-8') as f:
+        for move in steps:
+            move = move._replace(
+                source=os.path.abspath(move.source),
+                destination=move.destination and os.path.abspath(move.destination))
+            f.write(json.dumps(move._asdict(), ensure_ascii=False) + '\n')
+            yield move
+
+
+def read_plan(plan_path: str) -> Iterator[PlannedMove]:
+    """Reads the steps of a JSON Lines plan written by write_plan()."""
+    with open(plan_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield PlannedMove(**json.loads(line))
+
+
+def _hash_range_job(job: Tuple[str, int, int]) -> bytes:
+    """Process pool entry point: streaming hash of (path, start, end)."""
+    path, start, end = job
+    return hash_file_range(Path(path), start, end)
+
+
+def read_spotdl_songs(sidecar_path: str) -> List[dict]:
+    """
+    Reads the song entries of a .spotdl file.
+
+    Accepts both a saved query (a JSON list of songs) and a sync file (an
+    object whose 'songs' key holds that list).
+
+    Returns:
+        Song dicts, empty if the file can't be read
+    """
+    try:
+        with open(sidecar_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠ Couldn't read .spotdl file {os.path.basename(sidecar_path)}: {e}")
+        return []
+
+    if isinstance(data, dict):
+        data = data.get('songs')
+    if not isinstance(data, list):
+        return []
+    return [song for song in data if isinstance(song, dict)]
+
+
+def _track_key(name: str) -> str:
+    """Matching key for a track name: case-folded, letters and digits only."""
+    return re.sub(r'[\W_]+', '', name.casefold())
+
+
+def _read_metadata_batch(paths: List[str]) -> List[Tuple[str, str]]:
+    """Process pool entry point: reads (artist, album) for each path, in order."""
+    return [MusicOrganizer.read_metadata(Path(path)) for path in paths]
+
+
+def _scan_library_directory(directory: str, extensions: Tuple[str, ...]
+                            ) -> Tuple[str, List[Tuple[str, int, int]], List[str]]:
+    """Walker thread job: lists one directory's music files and subdirectories."""
+    music, subdirs = [], []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif os.path.splitext(entry.name)[1].lower() in extensions and entry.is_file():
+                        st = entry.stat()
+                        music.append((entry.path, st.st_size, st.st_mtime_ns))
+                except OSError:
+                    continue
+    except OSError as e:
+        print(f"⚠ Couldn't list {directory}: {e}")
+    return directory, music, subdirs
+
+
+def _catalog_batch(job: Tuple[str, str, List[Tuple[str, int, int]]]) -> Tuple[List[tuple], int]:
+    """
+    Process pool entry point: catalog rows for a batch of library files.
+
+    Returns:
+        Tuple of (rows in LibraryCatalog.add() order, number of unreadable files)
+    """
+    root, hash_kind, files = job
+    hasher = DuplicateDetector(audio=hash_kind == 'audio')
+    rows, errors = [], 0
+
+    for path, size, mtime_ns in files:
+        relative = os.path.relpath(path, root)
+        parts = relative.split(os.sep)
+        try:
+            if len(parts) == 3:
+                artist, album = parts[0], parts[1]
+            else:
+                artist, album = MusicOrganizer.read_metadata(path)
+            digest = hasher.partial_hash(Path(path))
+        except OSError:
+            errors += 1
+            continue
+        duration, bitrate = MusicOrganizer.read_audio_info(path)
+        rows.append((relative, size, mtime_ns, digest, artist, album,
+                     os.path.splitext(path)[1].lower().lstrip('.'), duration, bitrate))
+    return rows, errors
+
+
+def rebuild_catalog_command(argv: List[str]) -> None:
+    """The rebuild-catalog subcommand: catalogs an existing library from scratch."""
+    parser = argparse.ArgumentParser(
+        prog='music_organizer.py rebuild-catalog',
+        description="Rebuild the SQLite catalog of an organized library from the files in it"
+    )
+    parser.add_argument('destination', help='Organized library directory')
+    parser.add_argument('--catalog', metavar='PATH',
+                        help='Catalog file (default: DESTINATION/.music-organizer-catalog.db)')
+    parser.add_argument('--dedup', choices=['content', 'audio'], default='content',
+                        help='Duplicate check mode the stored hashes are for (default: content)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, metavar='N',
+                        help='Read files in N worker processes (default: CPU count)')
+    parser.add_argument('--walkers', type=int, default=8, metavar='N',
+                        help='List directories with N threads (default: 8)')
+    args = parser.parse_args(argv)
+
+    organizer = MusicOrganizer(args.destination, args.destination, workers=args.workers,
+                               dedup=args.dedup, catalog_path=args.catalog or '')
+    organizer.rebuild_catalog(walkers=args.walkers, hash_kind=args.dedup)
+
+
 def main():
     """Main function with argument parsing."""
+    if len(sys.argv) > 1 and sys.argv[1] == 'rebuild-catalog':
+        try:
+            rebuild_catalog_command(sys.argv[2:])
+        except KeyboardInterrupt:
+            print("\n\n⚠️  Catalog rebuild cancelled by user")
+        return
+
     parser = argparse.ArgumentParser(
         description="Organize music files into Artist/Album folder structure",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -227,6 +3926,9 @@ def main():
 Examples:
   python music_organizer.py ~/Downloads/Music ~/Music/Library
   python music_organizer.py "C:\\Downloads" "C:\\Music" --dry-run
+  python music_organizer.py ~/Downloads/Music ~/Music/Library --dry-run --plan-file plan.jsonl
+  python music_organizer.py ~/Downloads/Music ~/Music/Library --apply-plan plan.jsonl
+  python music_organizer.py rebuild-catalog ~/Music/Library --workers 8
         """
     )
 
@@ -234,17 +3936,97 @@ Examples:
     parser.add_argument('destination', help='Destination directory for organized library')
     parser.add_argument('--dry-run', action='store_true',
                         help='Show what would be done without making changes')
+    parser.add_argument('--plan-file', metavar='PATH',
+                        help='With --dry-run, write the plan to PATH as JSON Lines')
+    parser.add_argument('--apply-plan', metavar='PATH',
+                        help='Apply a plan written by --dry-run --plan-file')
+    parser.add_argument('--cache', metavar='PATH',
+                        help='SQLite file used to cache metadata between runs')
+    parser.add_argument('--cache-size', type=int, default=200000, metavar='N',
+                        help='Maximum number of cached entries (default: 200000)')
+    parser.add_argument('--spotdl-metadata', action='store_true',
+                        help='Take artist/album from .spotdl files instead of reading tags, '
+                             'and keep each .spotdl file until its folder is organized')
+    parser.add_argument('--dedup', choices=['name', 'content', 'audio'], default='content',
+                        help="Treat files as duplicates by matching 'name', identical "
+                             "'content', or identical 'audio' ignoring tags (default: content)")
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only scan directories that changed since the last run')
+    parser.add_argument('--state-file', metavar='PATH',
+                        help='State file for --incremental '
+                             '(default: DESTINATION/.music-organizer-state.json)')
+    parser.add_argument('--journal', nargs='?', const='', metavar='PATH',
+                        help='Record moves in a crash-safe journal '
+                             '(default: DESTINATION/.music-organizer-journal.jsonl)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Finish or roll back operations left by an interrupted run')
+    parser.add_argument('--catalog', nargs='?', const='', metavar='PATH',
+                        help='Record organized files in an SQLite catalog '
+                             '(default: DESTINATION/.music-organizer-catalog.db)')
+    parser.add_argument('--bloom', nargs='?', const='', metavar='PATH',
+                        help='Skip most destination lookups using a Bloom filter of the '
+                             'library (default: DESTINATION/.music-organizer-bloom)')
+    parser.add_argument('--bloom-refresh', action='store_true',
+                        help='With --bloom, first add library files changed since it was built')
+    parser.add_argument('--bloom-rebuild', action='store_true',
+                        help='With --bloom, rebuild it from scratch (drops removed files)')
+    parser.add_argument('--watch', action='store_true',
+                        help='Keep running and organize files as they are written (Linux only)')
+    parser.add_argument('--debounce', type=float, default=5.0, metavar='SECONDS',
+                        help='Quiet period before a watched folder is organized (default: 5)')
+    parser.add_argument('--workers', type=int, default=1, metavar='N',
+                        help='Parse metadata in N worker processes (default: 1)')
+    parser.add_argument('--io-concurrency', type=int, metavar='N',
+                        help='Copy across devices in the background, N files at a time '
+                             'per (source, destination) device pair (default: 2 with --io-pair)')
+    parser.add_argument('--io-queue-depth', type=int, default=4, metavar='N',
+                        help='Copies queued per device pair before moves wait (default: 4)')
+    parser.add_argument('--io-pair', nargs=4, action='append', metavar=('SRC', 'DST', 'N', 'DEPTH'),
+                        help='Concurrency and queue depth for copies from the device holding '
+                             'SRC to the one holding DST; may be repeated')
+    parser.add_argument('--drop-page-cache', action='store_true',
+                        help='Copy across devices without filling the page cache, so a big '
+                             'ingest does not slow down a media server on the same machine')
+    parser.add_argument('--link-mode', choices=['hardlink', 'symlink', 'reflink'],
+                        help='Build the library from links to the source files instead of '
+                             'moving them; the source folder is left as it is')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='Scan, read tags, plan and move concurrently')
+    parser.add_argument('--queue-size', type=int, default=256, metavar='N',
+                        help='With --pipeline, files buffered between stages (default: 256)')
 
     args = parser.parse_args()
-
-    if args.dry_run:
-        print("🔍 DRY RUN MODE - No files will be moved or deleted")
-        print("This feature is not yet implemented. Remove --dry-run to proceed.")
-        return
+    if args.plan_file and not args.dry_run:
+        parser.error('--plan-file only works with --dry-run')
+    if args.apply_plan and args.dry_run:
+        parser.error("--apply-plan can't be combined with --dry-run")
+    try:
+        io_pairs = [(src, dst, int(limit), int(depth)) for src, dst, limit, depth in args.io_pair or ()]
+    except ValueError:
+        parser.error('--io-pair: N and DEPTH must be integers')
 
     try:
-        organizer = MusicOrganizer(args.source, args.destination)
-        organizer.organize()
+        organizer = MusicOrganizer(args.source, args.destination,
+                                   cache_path=args.cache, cache_size=args.cache_size,
+                                   workers=args.workers, dedup=args.dedup,
+                                   incremental=args.incremental, state_path=args.state_file,
+                                   journal_path=args.journal, resume=args.resume,
+                                   bloom_path=args.bloom, bloom_refresh=args.bloom_refresh,
+                                   bloom_rebuild=args.bloom_rebuild, catalog_path=args.catalog,
+                                   spotdl_metadata=args.spotdl_metadata,
+                                   pipeline=args.pipeline, queue_size=args.queue_size,
+                                   io_concurrency=args.io_concurrency,
+                                   io_queue_depth=args.io_queue_depth, io_pairs=io_pairs,
+                                   drop_page_cache=args.drop_page_cache,
+                                   link_mode=args.link_mode, read_only=args.dry_run)
+        if args.dry_run:
+            organizer.dry_run(args.plan_file)
+        elif args.apply_plan:
+            organizer.apply_plan(args.apply_plan)
+        elif args.watch:
+            organizer.watch(debounce=args.debounce)
+        else:
+            organizer.organize()
 
     except KeyboardInterrupt:
         print("\n\n⚠️  Organization cancelled by user")